@@ -2,10 +2,12 @@
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QListWidget, QListWidgetItem, QComboBox, QLineEdit, QPushButton,
-    QLabel, QMessageBox, QSizePolicy  # Added QSizePolicy
+    QLabel, QMessageBox, QSizePolicy, QFileDialog  # Added QSizePolicy
 )
 from PyQt5.QtCore import Qt, pyqtSignal
 import database  # ADD THIS IMPORT
+import dropdown_io
+import sqlite3
 
 class AdminWindow(QMainWindow):
     
@@ -80,6 +82,19 @@ class AdminWindow(QMainWindow):
         self.delete_button = QPushButton("Delete Selected")
         self.delete_button.clicked.connect(self.delete_selected_item)
         main_layout.addWidget(self.delete_button)
+
+        # Bulk import/export
+        file_layout = QHBoxLayout()
+
+        self.import_button = QPushButton("Import from File...")
+        self.import_button.clicked.connect(self.import_items)
+        file_layout.addWidget(self.import_button)
+
+        self.export_button = QPushButton("Export All...")
+        self.export_button.clicked.connect(self.export_items)
+        file_layout.addWidget(self.export_button)
+
+        main_layout.addLayout(file_layout)
         
         # Load initial data
         self.load_category_items()
@@ -87,7 +102,8 @@ class AdminWindow(QMainWindow):
     def load_category_items(self):
         self.items_list.clear()
         category = self.category_combo.currentText()
-        items = database.get_dropdown_options(category)  # FIXED
+        # Streamed rather than cached, so large categories can be edited too
+        items = (value for _, value in database.iter_dropdown_options([category]))
         
         for item in items:
             list_item = QListWidgetItem(item)
@@ -133,43 +149,80 @@ class AdminWindow(QMainWindow):
             else:
                 QMessageBox.warning(self, "Error", "Failed to delete item!")
 
+    def import_items(self):
+        """Load options from a CSV/JSON file; entries without a category go to the selected one"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Dropdown Options", "", dropdown_io.FILE_FILTER
+        )
+        if not path:
+            return
+
+        category = self.category_combo.currentText()
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            counts = dropdown_io.import_options(path, category)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            QMessageBox.critical(self, "Import Error", f"Nothing was imported:\n{str(e)}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        if counts['added']:
+            self.load_category_items()
+            self.data_updated.emit()
+        QMessageBox.information(
+            self, "Import Complete",
+            f"Entries read: {counts['read']}\n"
+            f"Added: {counts['added']}\n"
+            f"Already present: {counts['duplicates']}\n"
+            f"Skipped (blank or not text): {counts['invalid']}"
+        )
+
+    def export_items(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Dropdown Options", "dropdown_options.csv", dropdown_io.FILE_FILTER
+        )
+        if not path:
+            return
+
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            count = dropdown_io.export_options(path)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            QMessageBox.critical(self, "Export Error", f"Export failed:\n{str(e)}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        QMessageBox.information(self, "Export Complete", f"Exported {count} entries to:\n{path}")
+
     # New move item functions
     def move_item_up(self):
-        current_row = self.items_list.currentRow()
-        if current_row <= 0:
-            return  # Already at top or no selection
-        
-        category = self.category_combo.currentText()
-        current_item = self.items_list.takeItem(current_row)
-        self.items_list.insertItem(current_row - 1, current_item)
-        self.items_list.setCurrentRow(current_row - 1)
-        self.save_category_order(category)
+        self.move_item(-1)
 
     def move_item_down(self):
+        self.move_item(1)
+
+    def move_item(self, offset):
+        """Move the selected item one place; only its own row is rewritten"""
         current_row = self.items_list.currentRow()
-        if current_row < 0 or current_row >= self.items_list.count() - 1:
-            return  # Already at bottom or no selection
-        
+        target_row = current_row + offset
+        if current_row < 0 or not 0 <= target_row < self.items_list.count():
+            return  # No selection, or already at top/bottom
+
         category = self.category_combo.currentText()
+        value = self.items_list.item(current_row).data(Qt.UserRole)
+        if not database.move_dropdown_option(category, value, offset):
+            return
+
         current_item = self.items_list.takeItem(current_row)
-        self.items_list.insertItem(current_row + 1, current_item)
-        self.items_list.setCurrentRow(current_row + 1)
-        self.save_category_order(category)
-
-    def save_category_order(self, category):
-        """Save current order to database"""
-        ordered_items = []
-        for i in range(self.items_list.count()):
-            item = self.items_list.item(i)
-            ordered_items.append(item.text())
-        
-        # Update database with new order
-        if database.update_dropdown_order(category, ordered_items):
-            self.data_updated.emit()
+        self.items_list.insertItem(target_row, current_item)
+        self.items_list.setCurrentRow(target_row)
+        self.data_updated.emit()
 
 if __name__ == "__main__":
     import sys
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(database.close_connections)
     window = AdminWindow()
     window.show()
     sys.exit(app.exec_())
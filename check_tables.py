@@ -1,5 +1,13 @@
 # check_tables.py
+import argparse
+import ast
+import os
+import re
 import sqlite3
+from migrations import SCHEMA_VERSION
+
+# Statements in database.py are written with upper-case keywords
+SQL_STATEMENT = re.compile(r"^(SELECT|INSERT|UPDATE|DELETE|WITH)\s")
 
 def check_table_exists(table_name):
     conn = sqlite3.connect('urology_data.db')
@@ -9,21 +17,95 @@ def check_table_exists(table_name):
     conn.close()
     return bool(result)
 
+def schema_version():
+    conn = sqlite3.connect('urology_data.db')
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.close()
+    return version
+
+def collect_queries(source_path):
+    """Return (line, sql) for every literal SQL statement in a module.
+
+    f-strings are skipped because their text is only known at runtime.
+    """
+    with open(source_path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), source_path)
+
+    in_fstring = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.JoinedStr):
+            in_fstring.update(id(value) for value in node.values)
+
+    queries = []
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Constant) and isinstance(node.value, str)
+                and id(node) not in in_fstring):
+            sql = " ".join(node.value.split())
+            if SQL_STATEMENT.match(sql):
+                queries.append((node.lineno, sql))
+    return sorted(queries)
+
+def explain_queries(source_path="database.py"):
+    """Print EXPLAIN QUERY PLAN for each query and flag table scans"""
+    import database  # Makes sure the schema and indexes are up to date
+
+    queries = collect_queries(source_path)
+    flagged = 0
+    with database.db_connection() as cursor:
+        for lineno, sql in queries:
+            print(f"\n{os.path.basename(source_path)}:{lineno}: {sql}")
+            params = (None,) * sql.count("?")
+            try:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            except sqlite3.Error as e:
+                print(f"    ❌ could not explain: {e}")
+                flagged += 1
+                continue
+            for row in cursor.fetchall():
+                detail = row["detail"]
+                if detail.startswith("SCAN") and "INDEX" not in detail:
+                    marker = "❌ full scan"
+                    flagged += 1
+                elif "VIRTUAL TABLE INDEX" in detail:
+                    marker = "✅"  # Full-text index lookup
+                elif detail.startswith("SCAN") or "TEMP B-TREE" in detail:
+                    marker = "⚠️"
+                    flagged += 1
+                else:
+                    marker = "✅"
+                print(f"    {marker} {detail}")
+
+    print(f"\n{len(queries)} queries checked, {flagged} plan steps flagged.")
+    return flagged
+
 if __name__ == "__main__":
-    required_tables = [
-        "dropdown_options", "patients", "operations", 
-        "prescriptions", "investigations", "report_history"
-    ]
-    
-    print("Database Status:")
-    all_exist = True
-    for table in required_tables:
-        exists = check_table_exists(table)
-        print(f"{table}: {'✅' if exists else '❌'}")
-        if not exists:
-            all_exist = False
-            
-    if all_exist:
-        print("\nAll tables are present!")
+    parser = argparse.ArgumentParser(description="Check the database schema")
+    parser.add_argument(
+        "--explain", action="store_true",
+        help="print EXPLAIN QUERY PLAN for every query in database.py and flag scans"
+    )
+    args = parser.parse_args()
+
+    if args.explain:
+        explain_queries()
     else:
-        print("\nSome tables are missing. Run repair_db.py to fix.")
+        required_tables = [
+            "dropdown_options", "patients", "operations",
+            "prescriptions", "investigations", "report_history"
+        ]
+
+        print("Database Status:")
+        all_exist = True
+        for table in required_tables:
+            exists = check_table_exists(table)
+            print(f"{table}: {'✅' if exists else '❌'}")
+            if not exists:
+                all_exist = False
+
+        version = schema_version()
+        print(f"schema version: {version} (current: {SCHEMA_VERSION}) {'✅' if version == SCHEMA_VERSION else '❌'}")
+
+        if all_exist and version == SCHEMA_VERSION:
+            print("\nAll tables are present!")
+        else:
+            print("\nThe schema is missing tables or migrations. Run repair_db.py to fix.")
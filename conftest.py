@@ -0,0 +1,22 @@
+# conftest.py
+import os
+import tempfile
+import pytest
+
+# Must be set before anything imports database, which opens (and migrates)
+# DB_PATH on import; the clinic's urology_data.db is never touched
+_session_dir = tempfile.mkdtemp(prefix="surgery_tests_")
+os.environ["SURGERY_DB_PATH"] = os.path.join(_session_dir, "import.db")
+
+import database
+
+
+@pytest.fixture(autouse=True)
+def test_database(tmp_path):
+    """Run every test against a fresh database in a temporary folder"""
+    previous = database.DB_PATH
+    database.configure(db_path=str(tmp_path / "test.db"))
+    try:
+        yield database.DB_PATH
+    finally:
+        database.configure(db_path=previous)
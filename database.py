@@ -1,128 +1,497 @@
-
-# d# database.py
+# database.py
+import atexit
+import itertools
 import sqlite3
 import os
+import re
+import threading
+import time
+from collections import namedtuple
 from contextlib import contextmanager
+import migrations
 
-DB_PATH = "urology_data.db"
+# SURGERY_DB_PATH points the program (or the test suite) at another database file
+DB_PATH = os.environ.get("SURGERY_DB_PATH", "urology_data.db")
 
-@contextmanager
-def db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+# Connection settings. The pragmas of the chosen profile are applied to
+# every new connection; call configure() to change the profile, pragmas or
+# database path at runtime.
+#   "workstation" - database on a local disk of one PC. WAL lets the print
+#                   dialog read while a record is saved, and synchronous=NORMAL
+#                   only syncs at checkpoints instead of on every commit.
+#   "shared"      - database file on a network share used by several PCs.
+#                   WAL and mmap rely on shared memory that network file
+#                   systems do not provide, so this keeps the rollback journal.
+#   "auto"        - (default) "shared" when the database is on a network drive
+#                   (UNC path, mapped drive, NFS/SMB mount), else "workstation".
+# Set the SURGERY_DB_PROFILE environment variable to override the choice,
+# e.g. "shared" for a network file system that is not recognised.
+POOL_SIZE = 4
+PROFILES = {
+    "workstation": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "foreign_keys": "ON",
+        "cache_size": -16000,       # KiB, i.e. 16 MB per connection
+        "mmap_size": 67108864,      # 64 MB
+        "temp_store": "MEMORY",
+    },
+    "shared": {
+        "busy_timeout": 10000,
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "foreign_keys": "ON",
+        "cache_size": -16000,
+        "mmap_size": 0,
+        "temp_store": "MEMORY",
+    },
+}
+NETWORK_FILE_SYSTEMS = {
+    "nfs", "nfs4", "cifs", "smb", "smbfs", "smb3", "afs", "ceph", "glusterfs",
+    "9p", "fuse.sshfs", "davfs", "fuse.davfs2",
+}
+
+def is_network_path(path):
+    """True if path is on a network share (best effort; False when unsure)"""
+    path = os.path.abspath(path)
+    if os.name == 'nt':
+        if path.startswith("\\\\"):
+            return True  # UNC path
+        import ctypes
+        drive = os.path.splitdrive(path)[0] + "\\"
+        return ctypes.windll.kernel32.GetDriveTypeW(drive) == 4  # DRIVE_REMOTE
     try:
+        with open("/proc/mounts", encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return False
+    # File system type of the longest mount point containing the path
+    best, fs_type = "", ""
+    for mount_point, mount_type in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+        if inside and len(mount_point) > len(best):
+            best, fs_type = mount_point, mount_type
+    return fs_type in NETWORK_FILE_SYSTEMS
+
+def resolve_profile(profile, db_path):
+    """Pragmas for a profile name; "auto" picks one for db_path"""
+    if profile == "auto":
+        profile = "shared" if is_network_path(db_path) else "workstation"
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown database profile {profile!r}; use one of: auto, {', '.join(PROFILES)}")
+    return PROFILES[profile]
+
+DB_PROFILE = os.environ.get("SURGERY_DB_PROFILE", "auto").strip().lower()
+try:
+    PRAGMAS = resolve_profile(DB_PROFILE, DB_PATH)
+except ValueError as e:
+    raise ValueError(f"SURGERY_DB_PROFILE: {e}") from None
+
+# Background WAL checkpoints (workstation profile). SQLite's own
+# auto-checkpoint runs inside whichever commit crosses the threshold; the
+# checkpointer thread does that work between saves instead, once the WAL
+# file has grown past CHECKPOINT_WAL_BYTES.
+CHECKPOINT_INTERVAL = 30            # Seconds between WAL size checks
+CHECKPOINT_WAL_BYTES = 4 * 1024 * 1024
+
+
+class ConnectionManager:
+    """Persistent SQLite connections, one per thread, with a small idle pool.
+
+    A thread keeps its connection for every call it makes instead of
+    reconnecting each time. Worker threads hand theirs back with release()
+    so the next worker can reuse it, and close_all() closes everything on
+    shutdown. Nested db_connection() blocks on the same thread share one
+    transaction, which is committed when the outermost block exits.
+    """
+
+    def __init__(self, db_path, pool_size=POOL_SIZE, pragmas=None):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.pragmas = dict(PRAGMAS if pragmas is None else pragmas)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._idle = []
+        self._open = set()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, cached_statements=256
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def acquire(self):
+        """Return the calling thread's connection, opening one if needed"""
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._connect()
+                with self._lock:
+                    self._open.add(conn)
+            local.conn = conn
+            local.depth = 0
+        return conn
+
+    def release(self):
+        """Give the calling thread's connection back to the idle pool"""
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is None or local.depth:
+            return
+        local.conn = None
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+            self._open.discard(conn)
+        conn.close()
+
+    def close_all(self):
+        """Close every connection opened by this manager"""
+        with self._lock:
+            conns = list(self._open)
+            self._open.clear()
+            self._idle.clear()
+            self._local = threading.local()
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    @contextmanager
+    def cursor(self):
+        conn = self.acquire()
+        local = self._local
+        local.depth += 1
         cursor = conn.cursor()
-        yield cursor
-        conn.commit()
+        try:
+            yield cursor
+        except BaseException:
+            local.depth -= 1
+            if local.depth == 0:
+                conn.rollback()
+            raise
+        else:
+            local.depth -= 1
+            if local.depth == 0:
+                conn.commit()
+        finally:
+            cursor.close()
+
+
+_manager = ConnectionManager(DB_PATH)
+
+def configure(db_path=None, pool_size=None, pragmas=None, profile=None):
+    """Close open connections and reopen the pool with new settings"""
+    global DB_PATH, DB_PROFILE, PRAGMAS, MIGRATIONS_APPLIED, _manager
+    _manager.close_all()
+    if profile is not None:
+        PRAGMAS = resolve_profile(profile, DB_PATH if db_path is None else db_path)
+        DB_PROFILE = profile
+    elif db_path is not None and DB_PROFILE == "auto":
+        PRAGMAS = resolve_profile(DB_PROFILE, db_path)
+    if db_path is not None:
+        DB_PATH = db_path
+    _manager = ConnectionManager(
+        DB_PATH,
+        pool_size=POOL_SIZE if pool_size is None else pool_size,
+        pragmas=pragmas
+    )
+    if db_path is not None:
+        MIGRATIONS_APPLIED = migrate()
+    _dropdown_cache.reset()
+
+def db_connection():
+    return _manager.cursor()
+
+def release_connection():
+    """Return the current thread's connection to the pool (worker threads)"""
+    _manager.release()
+
+def close_connections():
+    """Close all pooled connections. Call once on application shutdown."""
+    _manager.close_all()
+
+def checkpoint(mode="PASSIVE"):
+    """Copy WAL content back into the database file.
+
+    PASSIVE never waits for readers or writers; TRUNCATE waits and also
+    empties the WAL file. Returns (busy, wal_pages, checkpointed_pages);
+    (0, -1, -1) when the database is not in WAL mode.
+    """
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"Unknown checkpoint mode: {mode}")
+    with db_connection() as cursor:
+        cursor.execute(f"PRAGMA wal_checkpoint({mode})")
+        return tuple(cursor.fetchone())
+
+_checkpointer = None
+_checkpointer_stop = threading.Event()
+
+def _run_checkpointer(interval, wal_bytes):
+    try:
+        while not _checkpointer_stop.wait(interval):
+            try:
+                if os.path.getsize(DB_PATH + "-wal") >= wal_bytes:
+                    checkpoint("PASSIVE")
+            except (OSError, sqlite3.Error):
+                pass  # No WAL file yet, or the database is busy; try next time
     finally:
-        conn.close()
+        release_connection()
+
+def start_checkpointer(interval=CHECKPOINT_INTERVAL, wal_bytes=CHECKPOINT_WAL_BYTES):
+    """Checkpoint the WAL from a background thread (no-op outside WAL mode)"""
+    global _checkpointer
+    if _checkpointer is not None or PRAGMAS.get("journal_mode", "").upper() != "WAL":
+        return
+    _checkpointer_stop.clear()
+    _checkpointer = threading.Thread(
+        target=_run_checkpointer, args=(interval, wal_bytes),
+        name="wal-checkpointer", daemon=True
+    )
+    _checkpointer.start()
+
+def stop_checkpointer():
+    global _checkpointer
+    if _checkpointer is not None:
+        _checkpointer_stop.set()
+        _checkpointer.join()
+        _checkpointer = None
+
+def shutdown():
+    """Stop background work and close every connection. Closing the last
+    connection checkpoints the WAL and removes it."""
+    stop_checkpointer()
+    close_connections()
+
+atexit.register(shutdown)
 
-# database.py (update the initialization at the end)
-
-# Always check and create missing tables
-def check_and_create_tables():
-    with db_connection() as cursor:
-        # Get existing tables
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        existing_tables = {row[0] for row in cursor.fetchall()}
-
-        # Table creation commands
-        table_creations = [
-            """CREATE TABLE IF NOT EXISTS dropdown_options (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                category TEXT NOT NULL,
-                value TEXT NOT NULL,
-                UNIQUE(category, value)
-            );""",
-            """CREATE TABLE IF NOT EXISTS patients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                age INTEGER,
-                sex TEXT,
-                admission_date TEXT,
-                discharge_date TEXT,
-                bht_no TEXT UNIQUE,
-                indication TEXT,
-                history_exam TEXT,
-                management TEXT,
-                next_appointment TEXT
-            );""",
-            """CREATE TABLE IF NOT EXISTS operations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                patient_id INTEGER NOT NULL,
-                surgeon TEXT,
-                anaesthetist TEXT,
-                anaesthesia_type TEXT,
-                surgery_name TEXT,
-                surgery_description TEXT,
-                FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE
-            );""",
-            """CREATE TABLE IF NOT EXISTS prescriptions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                patient_id INTEGER NOT NULL,
-                drug_name TEXT,
-                drug_form TEXT,
-                strength TEXT,
-                dose TEXT,
-                frequency TEXT,
-                route TEXT,
-                duration TEXT,
-                FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE
-            );""",
-            """CREATE TABLE IF NOT EXISTS investigations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                patient_id INTEGER NOT NULL,
-                name TEXT NOT NULL,
-                value TEXT NOT NULL,
-                FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE
-            );""",
-            """CREATE TABLE IF NOT EXISTS op_variables (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                patient_id INTEGER NOT NULL,
-                name TEXT NOT NULL,
-                value TEXT NOT NULL,
-                FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE
-            );""",
-            """CREATE TABLE IF NOT EXISTS report_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                patient_id INTEGER NOT NULL,
-                report_path TEXT NOT NULL,
-                printed_at TEXT NOT NULL,
-                FOREIGN KEY(patient_id) REFERENCES patients(id)
-            );"""
+def migrate():
+    """Bring the schema up to date (see migrations.py).
+
+    Only reads PRAGMA user_version when the database is already current.
+    """
+    global FTS_AVAILABLE
+    with db_connection() as cursor:
+        applied = migrations.migrate(cursor)
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'patient_search'")
+        FTS_AVAILABLE = cursor.fetchone() is not None
+    return applied
+
+# Full-text patient search. If this SQLite build has no FTS5 the index is
+# not created and find_patients() falls back to a LIKE scan.
+FTS_AVAILABLE = False
+
+# Versions applied when the database was opened (at import or by configure())
+MIGRATIONS_APPLIED = migrate()
+
+# Dropdown option cache. Every category is loaded with one query and served
+# from memory until something changes. Writes through this module invalidate
+# it directly; PRAGMA data_version (checked at most every
+# DROPDOWN_RECHECK_SECONDS) catches writes made by other processes. A
+# reload compares the dropdown_revisions stamps and re-reads only the
+# categories whose revision moved, then bumps a version counter for each of
+# them so the UI can refresh just those.
+#
+# Categories with more than LARGE_DROPDOWN_CATEGORY options (a national drug
+# list, say) are only counted, never held in memory; they are looked up with
+# search_dropdown_prefix() or streamed with iter_dropdown_options().
+DROPDOWN_RECHECK_SECONDS = 2.0
+LARGE_DROPDOWN_CATEGORY = 500
+
+class DropdownCache:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._options = {}
+        self._counts = {}
+        self._revisions = None
+        self._stale = True
+        self._data_version = None
+        self._checked_at = 0.0
+        self.version = 0
+        self._category_versions = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._stale = True
+
+    def reset(self):
+        """Forget everything read so far, e.g. after switching databases.
+
+        The next read reloads every category; the version counter carries on,
+        so categories that differ from before are reported as changed.
+        """
+        with self._lock:
+            self._revisions = None
+            self._data_version = None
+            self._checked_at = 0.0
+            self._stale = True
+
+    def _check_external_changes(self):
+        now = time.monotonic()
+        if now - self._checked_at < DROPDOWN_RECHECK_SECONDS:
+            return
+        self._checked_at = now
+        with db_connection() as cursor:
+            cursor.execute("PRAGMA data_version")
+            data_version = (id(cursor.connection), cursor.fetchone()[0])
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._stale = True
+
+    def _load(self):
+        revisions = get_dropdown_revisions()
+        if self._revisions is None:
+            changed = None  # First load: everything
+        else:
+            changed = {
+                category for category in revisions.keys() | self._revisions.keys()
+                if revisions.get(category) != self._revisions.get(category)
+            }
+
+        if changed is None:
+            counts = _count_dropdown_options()
+            options = {}
+        else:
+            counts = {category: n for category, n in self._counts.items() if category not in changed}
+            options = {category: values for category, values in self._options.items() if category not in changed}
+            if changed:
+                counts.update(_count_dropdown_options(changed))
+        small = [
+            category for category, count in counts.items()
+            if count <= LARGE_DROPDOWN_CATEGORY and (changed is None or category in changed)
         ]
+        if small:
+            options.update(_read_dropdown_options(small))
+
+        for category in options.keys() | self._options.keys() | counts.keys() | self._counts.keys():
+            large = counts.get(category, 0) > LARGE_DROPDOWN_CATEGORY
+            if options.get(category) != self._options.get(category) or (
+                    large and (changed is None or category in changed)):
+                self.version += 1
+                self._category_versions[category] = self.version
+        self._options = options
+        self._counts = counts
+        self._revisions = revisions
+        self._stale = False
+
+    def refresh(self):
+        """Reload if anything changed. Returns the current version."""
+        with self._lock:
+            self._check_external_changes()
+            if self._stale:
+                self._load()
+            return self.version
+
+    def get(self, category):
+        with self._lock:
+            self.refresh()
+            return list(self._options.get(category, ()))
 
-        # Execute each creation command
-        for create_cmd in table_creations:
-            cursor.execute(create_cmd)
+    def count(self, category):
+        with self._lock:
+            self.refresh()
+            return self._counts.get(category, 0)
 
-# Initialize database on start
-if not os.path.exists(DB_PATH):
-    # Create new database
-    check_and_create_tables()
-else:
-    # Ensure all tables exist in existing database
-    check_and_create_tables()
+    def changed_since(self, version):
+        with self._lock:
+            self.refresh()
+            return {
+                category for category, changed_at in self._category_versions.items()
+                if changed_at > version
+            }
+
+_dropdown_cache = DropdownCache()
+
+def _read_dropdown_options(categories=None):
+    """{category: [values]} for all categories, or only the given ones"""
+    with db_connection() as cursor:
+        if categories is None:
+            cursor.execute(
+                "SELECT category, value FROM dropdown_options ORDER BY category, display_order, value"
+            )
+        else:
+            placeholders = ", ".join("?" * len(categories))
+            cursor.execute(
+                f"SELECT category, value FROM dropdown_options "
+                f"WHERE category IN ({placeholders}) ORDER BY category, display_order, value",
+                tuple(categories)
+            )
+        options = {}
+        for category, value in cursor.fetchall():
+            options.setdefault(category, []).append(value)
+        return options
+
+def _count_dropdown_options(categories=None):
+    """{category: number of options} for all categories, or only the given ones"""
+    with db_connection() as cursor:
+        if categories is None:
+            cursor.execute("SELECT category, COUNT(*) FROM dropdown_options GROUP BY category")
+        else:
+            placeholders = ", ".join("?" * len(categories))
+            cursor.execute(
+                f"SELECT category, COUNT(*) FROM dropdown_options "
+                f"WHERE category IN ({placeholders}) GROUP BY category",
+                tuple(categories)
+            )
+        return {category: count for category, count in cursor.fetchall()}
+
+def get_dropdown_revisions():
+    """{category: revision} for every category that has ever changed"""
+    with db_connection() as cursor:
+        cursor.execute("SELECT category, revision FROM dropdown_revisions")
+        return {category: revision for category, revision in cursor.fetchall()}
+
+def dropdown_version():
+    """Current dropdown version; pass it to changed_dropdown_categories() later"""
+    return _dropdown_cache.refresh()
+
+def changed_dropdown_categories(since_version):
+    """Categories whose options changed after since_version"""
+    return _dropdown_cache.changed_since(since_version)
+
+def invalidate_dropdown_cache():
+    _dropdown_cache.invalidate()
+
+# Options are shown in display_order. Ranks are kept DISPLAY_ORDER_GAP apart
+# so that moving an option only rewrites that option's row.
+DISPLAY_ORDER_GAP = 1024
 
 # CRUD Operations
 def add_dropdown_option(category, value):
     with db_connection() as cursor:
         try:
+            # New options go to the end of their category
             cursor.execute(
-                "INSERT INTO dropdown_options (category, value) VALUES (?, ?)",
-                (category, value)
+                """INSERT INTO dropdown_options (category, value, display_order)
+                   SELECT ?, ?, COALESCE(MAX(display_order), 0) + ?
+                   FROM dropdown_options WHERE category = ?""",
+                (category, value, DISPLAY_ORDER_GAP, category)
             )
-            return True
         except sqlite3.IntegrityError:
             return False  # Duplicate entry
+    _dropdown_cache.invalidate()
+    return True
 
 def get_dropdown_options(category):
-    with db_connection() as cursor:
-        cursor.execute(
-            "SELECT value FROM dropdown_options WHERE category = ? ORDER BY value",
-            (category,)
-        )
-        return [row[0] for row in cursor.fetchall()]
+    """Options of a category in display order; [] for a large category"""
+    return _dropdown_cache.get(category)
+
+def count_dropdown_options(category):
+    return _dropdown_cache.count(category)
+
+def is_large_dropdown_category(category):
+    """True if the category is too large to list (see LARGE_DROPDOWN_CATEGORY)"""
+    return count_dropdown_options(category) > LARGE_DROPDOWN_CATEGORY
 
 def delete_dropdown_option(category, value):
     with db_connection() as cursor:
@@ -130,7 +499,10 @@ def delete_dropdown_option(category, value):
             "DELETE FROM dropdown_options WHERE category = ? AND value = ?",
             (category, value)
         )
-        return cursor.rowcount > 0
+        deleted = cursor.rowcount > 0
+    if deleted:
+        _dropdown_cache.invalidate()
+    return deleted
 
 def remove_obsolete_operation_categories():
     obsolete = ["ureters", "bladder", "prostate", "uoo"]
@@ -140,6 +512,7 @@ def remove_obsolete_operation_categories():
                 "DELETE FROM dropdown_options WHERE category = ?",
                 (item,)
             )
+    _dropdown_cache.invalidate()
 
 def add_op_variable(patient_id, name, value):
     with db_connection() as cursor:
@@ -164,6 +537,10 @@ def delete_op_variables(patient_id):
             (patient_id,)
         )
 
+def save_op_variables(patient_id, op_variables, diff=False):
+    with db_connection() as cursor:
+        _write_child_rows(cursor, 'op_variables', patient_id, op_variables, diff)
+
 def save_patient(patient_data):
     with db_connection() as cursor:
         try:
@@ -223,6 +600,8 @@ def update_patient(patient_id, patient_data):
 
 def delete_patient(patient_id):
     with db_connection() as cursor:
+        # report_history has no ON DELETE CASCADE; the other child tables do
+        cursor.execute("DELETE FROM report_history WHERE patient_id = ?", (patient_id,))
         cursor.execute("DELETE FROM patients WHERE id = ?", (patient_id,))
         return cursor.rowcount > 0
 
@@ -235,6 +614,36 @@ def search_patients(search_term):
         """, (f'%{search_term}%', f'%{search_term}%'))
         return cursor.fetchall()
 
+def find_patients(search_term, limit=50):
+    """Ranked patient search by name, BHT number, indication or surgery.
+
+    Every word typed is matched as a prefix ("smi jo" finds "John Smith"),
+    name and BHT matches rank above indication/surgery matches, and at most
+    `limit` rows (id, name, bht_no) are returned.
+    """
+    terms = re.findall(r"\w+", search_term or "")
+    if not terms:
+        return []
+
+    with db_connection() as cursor:
+        if FTS_AVAILABLE:
+            cursor.execute("""
+                SELECT patients.id, patients.name, patients.bht_no
+                FROM patient_search
+                JOIN patients ON patients.id = patient_search.rowid
+                WHERE patient_search MATCH ?
+                ORDER BY bm25(patient_search, 10.0, 10.0, 2.0, 2.0), patients.name
+                LIMIT ?
+            """, (" ".join(f'"{term}"*' for term in terms), limit))
+        else:
+            cursor.execute("""
+                SELECT id, name, bht_no FROM patients
+                WHERE name LIKE ? OR bht_no LIKE ?
+                ORDER BY name
+                LIMIT ?
+            """, (f'%{search_term}%', f'%{search_term}%', limit))
+        return cursor.fetchall()
+
 def get_patient(patient_id):
     with db_connection() as cursor:
         cursor.execute("SELECT * FROM patients WHERE id = ?", (patient_id,))
@@ -253,11 +662,10 @@ def save_operation(patient_id, operation_data):
             operation_data['anaesthetist'],
             operation_data['anaesthesia_type'],
             operation_data['surgery_name'],
-            operation_data['surgery_description']
+            operation_data['surgery_description']            
         ))
         return cursor.lastrowid
 
-
 def update_operation(operation_id, operation_data):
     with db_connection() as cursor:
         cursor.execute("""
@@ -273,7 +681,7 @@ def update_operation(operation_id, operation_data):
             operation_data['anaesthetist'],
             operation_data['anaesthesia_type'],
             operation_data['surgery_name'],
-            operation_data['surgery_description'],
+            operation_data['surgery_description'],           
             operation_id
         ))
 
@@ -282,56 +690,60 @@ def get_patient_operation(patient_id):
         cursor.execute("SELECT * FROM operations WHERE patient_id = ?", (patient_id,))
         return cursor.fetchone()
 
-def save_prescriptions(patient_id, prescriptions):
+def save_prescriptions(patient_id, prescriptions, diff=False):
+    """Replace the patient's prescriptions with a single executemany.
+
+    With diff=True only rows that changed are deleted/inserted (see
+    _write_child_rows) instead of deleting and reinserting the whole list.
+    """
     with db_connection() as cursor:
-        cursor.execute("DELETE FROM prescriptions WHERE patient_id = ?", (patient_id,))
-        for drug in prescriptions:
-            cursor.execute("""
-                INSERT INTO prescriptions (
-                    patient_id, drug_name, drug_form, strength, 
-                    dose, frequency, route, duration
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                patient_id,
-                drug['drug_name'],
-                drug['drug_form'],
-                drug['strength'],
-                drug['dose'],
-                drug['frequency'],
-                drug['route'],
-                drug['duration']
-            ))
+        _write_child_rows(cursor, 'prescriptions', patient_id, prescriptions, diff)
 
-#def get_patient_prescriptions(patient_id):
-#    with db_connection() as cursor:
-#        cursor.execute("SELECT * FROM prescriptions WHERE patient_id = ?", (patient_id,))
-#       return cursor.fetchall()
-# database.py
 def get_patient_prescriptions(patient_id):
     with db_connection() as cursor:
-        cursor.execute("""
-            SELECT 
-                drug_name, drug_form, strength, dose, 
-                frequency, route, duration 
-            FROM prescriptions 
-            WHERE patient_id = ?
-        """, (patient_id,))
+        cursor.execute("SELECT * FROM prescriptions WHERE patient_id = ?", (patient_id,))
         return cursor.fetchall()
 
-def save_investigations(patient_id, investigations):
+def save_investigations(patient_id, investigations, diff=False):
     with db_connection() as cursor:
-        cursor.execute("DELETE FROM investigations WHERE patient_id = ?", (patient_id,))
-        for test in investigations:
-            cursor.execute("""
-                INSERT INTO investigations (patient_id, name, value)
-                VALUES (?, ?, ?)
-            """, (patient_id, test['name'], test['value']))
+        _write_child_rows(cursor, 'investigations', patient_id, investigations, diff)
 
 def get_patient_investigations(patient_id):
     with db_connection() as cursor:
         cursor.execute("SELECT * FROM investigations WHERE patient_id = ?", (patient_id,))
         return cursor.fetchall()
 
+# Everything needed to show or print one patient, read in one go.
+# Rows are sqlite3.Row objects and child lists are tuples, so a bundle can
+# be shared between the form and the report generator without copying.
+PatientBundle = namedtuple(
+    'PatientBundle',
+    ['patient', 'operation', 'prescriptions', 'investigations', 'op_variables']
+)
+
+def load_patient_bundle(patient_id):
+    """Load a patient and all child records on one connection.
+
+    The reads run inside a single read transaction so the bundle is a
+    consistent snapshot. Returns None if the patient does not exist.
+    """
+    with db_connection() as cursor:
+        if not cursor.connection.in_transaction:
+            cursor.execute("BEGIN")
+        cursor.execute("SELECT * FROM patients WHERE id = ?", (patient_id,))
+        patient = cursor.fetchone()
+        if patient is None:
+            return None
+        cursor.execute("SELECT * FROM operations WHERE patient_id = ?", (patient_id,))
+        operation = cursor.fetchone()
+        cursor.execute("SELECT * FROM prescriptions WHERE patient_id = ? ORDER BY id", (patient_id,))
+        prescriptions = tuple(cursor.fetchall())
+        cursor.execute("SELECT * FROM investigations WHERE patient_id = ? ORDER BY id", (patient_id,))
+        investigations = tuple(cursor.fetchall())
+        cursor.execute("SELECT name, value FROM op_variables WHERE patient_id = ? ORDER BY id", (patient_id,))
+        op_variables = tuple(cursor.fetchall())
+        return PatientBundle(patient, operation, prescriptions, investigations, op_variables)
+
 def get_print_history(patient_id):
     with db_connection() as cursor:
         cursor.execute(
@@ -340,318 +752,370 @@ def get_print_history(patient_id):
         )
         return cursor.fetchall()
 
-# Initialize the database
-if not os.path.exists(DB_PATH):
-    initialize_database()# database.py
-import sqlite3
-import os
-from contextlib import contextmanager
+def get_print_history_page(patient_id, limit=50, after=None):
+    """One page of a patient's report history, newest first.
 
-DB_PATH = "urology_data.db"
-
-@contextmanager
-def db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        cursor = conn.cursor()
-        yield cursor
-        conn.commit()
-    finally:
-        conn.close()
-
-def initialize_database():
+    after is the (printed_at, id) of the last row of the previous page;
+    seeking past it keeps every page an index range scan.
+    """
     with db_connection() as cursor:
-        # Dropdown options table - FIXED MISSING PARENTHESIS
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS dropdown_options (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            category TEXT NOT NULL,
-            value TEXT NOT NULL,
-            UNIQUE(category, value)
-        );
-        """)
-        
-        # Patients table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS patients (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            age INTEGER,
-            sex TEXT,
-            admission_date TEXT,
-            discharge_date TEXT,
-            bht_no TEXT UNIQUE,
-            indication TEXT,
-            history_exam TEXT,
-            management TEXT,
-            next_appointment TEXT
-        );
-        """)
-        
-        # Operations table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS operations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            patient_id INTEGER NOT NULL,
-            surgeon TEXT,
-            anaesthetist TEXT,
-            anaesthesia_type TEXT,
-            surgery_name TEXT,
-            surgery_description TEXT,
-            FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE
-        );
-        """)
-        
-        # Prescriptions table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS prescriptions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            patient_id INTEGER NOT NULL,
-            drug_name TEXT,
-            drug_form TEXT,
-            strength TEXT,
-            dose TEXT,
-            frequency TEXT,
-            route TEXT,
-            duration TEXT,
-            FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE
-        );
-        """)
-        
-        # Investigations table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS investigations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            patient_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            value TEXT NOT NULL,
-            FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE
-        );
-        """)
-        
-        # Report history table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS report_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            patient_id INTEGER NOT NULL,
-            report_path TEXT NOT NULL,
-            printed_at TEXT NOT NULL,
-            FOREIGN KEY(patient_id) REFERENCES patients(id)
-        );
-        """)
-
-# CRUD Operations
-def add_dropdown_option(category, value):
-    with db_connection() as cursor:
-        try:
+        if after is None:
             cursor.execute(
-                "INSERT INTO dropdown_options (category, value) VALUES (?, ?)",
-                (category, value)
+                """SELECT id, report_path, printed_at FROM report_history
+                   WHERE patient_id = ?
+                   ORDER BY printed_at DESC, id DESC LIMIT ?""",
+                (patient_id, limit)
             )
-            return True
-        except sqlite3.IntegrityError:
-            return False  # Duplicate entry
+        else:
+            cursor.execute(
+                """SELECT id, report_path, printed_at FROM report_history
+                   WHERE patient_id = ? AND (printed_at, id) < (?, ?)
+                   ORDER BY printed_at DESC, id DESC LIMIT ?""",
+                (patient_id, after[0], after[1], limit)
+            )
+        return cursor.fetchall()
 
-def get_dropdown_options(category):
+def find_cached_report(patient_id, content_hash):
+    """Path of the newest report generated from identical content, or None"""
     with db_connection() as cursor:
         cursor.execute(
-            "SELECT value FROM dropdown_options WHERE category = ? ORDER BY value",
-            (category,)
+            """SELECT report_path FROM report_history
+               WHERE patient_id = ? AND content_hash = ?
+               ORDER BY id DESC LIMIT 1""",
+            (patient_id, content_hash)
         )
-        return [row[0] for row in cursor.fetchall()]
+        row = cursor.fetchone()
+        return row['report_path'] if row else None
 
-def delete_dropdown_option(category, value):
+def delete_report_history(report_paths):
+    """Remove the history rows of report files that no longer exist"""
+    report_paths = list(report_paths)
+    if not report_paths:
+        return 0
     with db_connection() as cursor:
+        placeholders = ", ".join("?" * len(report_paths))
         cursor.execute(
-            "DELETE FROM dropdown_options WHERE category = ? AND value = ?",
-            (category, value)
+            f"DELETE FROM report_history WHERE report_path IN ({placeholders})",
+            report_paths
         )
-        return cursor.rowcount > 0
+        return cursor.rowcount
 
-def save_patient(patient_data):
-    with db_connection() as cursor:
-        try:
-            cursor.execute("""
-                INSERT INTO patients (
-                    name, age, sex, admission_date, discharge_date,
-                    bht_no, indication, history_exam, management, next_appointment
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                patient_data['name'],
-                patient_data['age'],
-                patient_data['sex'],
-                patient_data['admission_date'],
-                patient_data['discharge_date'],
-                patient_data['bht_no'],
-                patient_data['indication'],
-                patient_data['history_exam'],
-                patient_data['management'],
-                patient_data['next_appointment']
-            ))
-            return cursor.lastrowid
-        except sqlite3.IntegrityError:
+# Encounter (unit of work) operations
+def save_encounter(patient_data, operation_data, prescriptions, investigations, op_variables):
+    """Save a new patient with all related records in a single transaction.
+
+    op_variables is a list of {'name': ..., 'value': ...} dicts. Returns the
+    new patient id, or None if the BHT number already exists (nothing is
+    written in that case). Any other error rolls the whole encounter back.
+    """
+    with db_connection():
+        patient_id = save_patient(patient_data)
+        if patient_id is None:
             return None  # Duplicate BHT
+        save_operation(patient_id, operation_data)
+        _save_encounter_children(patient_id, prescriptions, investigations, op_variables)
+        return patient_id
 
-def update_patient(patient_id, patient_data):
-    with db_connection() as cursor:
-        try:
-            cursor.execute("""
-                UPDATE patients SET
-                    name = ?,
-                    age = ?,
-                    sex = ?,
-                    admission_date = ?,
-                    discharge_date = ?,
-                    bht_no = ?,
-                    indication = ?,
-                    history_exam = ?,
-                    management = ?,
-                    next_appointment = ?
-                WHERE id = ?
-            """, (
-                patient_data['name'],
-                patient_data['age'],
-                patient_data['sex'],
-                patient_data['admission_date'],
-                patient_data['discharge_date'],
-                patient_data['bht_no'],
-                patient_data['indication'],
-                patient_data['history_exam'],
-                patient_data['management'],
-                patient_data['next_appointment'],
-                patient_id
-            ))
-            return True
-        except sqlite3.IntegrityError:
-            return False  # Duplicate BHT
+def update_encounter(patient_id, patient_data, operation_data, prescriptions, investigations, op_variables):
+    """Update an existing patient and all related records in a single transaction.
 
-def delete_patient(patient_id):
-    with db_connection() as cursor:
-        cursor.execute("DELETE FROM patients WHERE id = ?", (patient_id,))
-        return cursor.rowcount > 0
+    Returns patient_id, or None if the new BHT number belongs to another
+    patient (nothing is written in that case).
+    """
+    with db_connection():
+        if not update_patient(patient_id, patient_data):
+            return None  # Duplicate BHT
+        operation = get_patient_operation(patient_id)
+        if operation:
+            update_operation(operation['id'], operation_data)
+        else:
+            save_operation(patient_id, operation_data)
+        _save_encounter_children(patient_id, prescriptions, investigations, op_variables)
+        return patient_id
 
-def search_patients(search_term):
-    with db_connection() as cursor:
-        cursor.execute("""
-            SELECT id, name, bht_no FROM patients
-            WHERE name LIKE ? OR bht_no LIKE ?
-            ORDER BY name
-        """, (f'%{search_term}%', f'%{search_term}%'))
-        return cursor.fetchall()
+def _save_encounter_children(patient_id, prescriptions, investigations, op_variables):
+    # Called inside the caller's transaction; only changed rows are written
+    save_prescriptions(patient_id, prescriptions, diff=True)
+    save_investigations(patient_id, investigations, diff=True)
+    save_op_variables(patient_id, op_variables, diff=True)
 
-def get_patient(patient_id):
-    with db_connection() as cursor:
-        cursor.execute("SELECT * FROM patients WHERE id = ?", (patient_id,))
-        return cursor.fetchone()
+# Bulk writers for per-patient child tables. Statements are kept as fixed
+# strings so sqlite3's statement cache reuses the prepared versions.
+_CHILD_TABLES = {
+    'prescriptions': {
+        'fields': ('drug_name', 'drug_form', 'strength', 'dose', 'frequency', 'route', 'duration'),
+        'select': """
+            SELECT id, drug_name, drug_form, strength, dose, frequency, route, duration
+            FROM prescriptions WHERE patient_id = ? ORDER BY id
+        """,
+        'insert': """
+            INSERT INTO prescriptions (
+                patient_id, drug_name, drug_form, strength,
+                dose, frequency, route, duration
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        'delete_all': "DELETE FROM prescriptions WHERE patient_id = ?",
+        'delete_row': "DELETE FROM prescriptions WHERE id = ?"
+    },
+    'investigations': {
+        'fields': ('name', 'value'),
+        'select': "SELECT id, name, value FROM investigations WHERE patient_id = ? ORDER BY id",
+        'insert': "INSERT INTO investigations (patient_id, name, value) VALUES (?, ?, ?)",
+        'delete_all': "DELETE FROM investigations WHERE patient_id = ?",
+        'delete_row': "DELETE FROM investigations WHERE id = ?"
+    },
+    'op_variables': {
+        'fields': ('name', 'value'),
+        'select': "SELECT id, name, value FROM op_variables WHERE patient_id = ? ORDER BY id",
+        'insert': "INSERT INTO op_variables (patient_id, name, value) VALUES (?, ?, ?)",
+        'delete_all': "DELETE FROM op_variables WHERE patient_id = ?",
+        'delete_row': "DELETE FROM op_variables WHERE id = ?"
+    }
+}
 
-def save_operation(patient_id, operation_data):
-    with db_connection() as cursor:
-        cursor.execute("""
-            INSERT INTO operations (
-                patient_id, surgeon, anaesthetist, anaesthesia_type,
-                surgery_name, surgery_description
-            ) VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            patient_id,
-            operation_data['surgeon'],
-            operation_data['anaesthetist'],
-            operation_data['anaesthesia_type'],
-            operation_data['surgery_name'],
-            operation_data['surgery_description']            
-        ))
-        return cursor.lastrowid
+def _write_child_rows(cursor, table, patient_id, records, diff=False):
+    """Write a patient's rows for one child table with executemany.
 
-def update_operation(operation_id, operation_data):
-    with db_connection() as cursor:
-        cursor.execute("""
-            UPDATE operations SET
-                surgeon = ?,
-                anaesthetist = ?,
-                anaesthesia_type = ?,
-                surgery_name = ?,
-                surgery_description = ?
-            WHERE id = ?
-        """, (
-            operation_data['surgeon'],
-            operation_data['anaesthetist'],
-            operation_data['anaesthesia_type'],
-            operation_data['surgery_name'],
-            operation_data['surgery_description'],           
-            operation_id
-        ))
+    Without diff the existing rows are deleted and the list reinserted.
+    With diff the stored rows (in id order) are compared with the new list:
+    the unchanged leading rows are kept and only the remainder is deleted
+    and inserted, so re-saving an unchanged record writes nothing and
+    appending a row writes one. Display order (by id) is always preserved.
+    """
+    spec = _CHILD_TABLES[table]
+    rows = [tuple(record[field] for field in spec['fields']) for record in records]
 
-def get_patient_operation(patient_id):
-    with db_connection() as cursor:
-        cursor.execute("SELECT * FROM operations WHERE patient_id = ?", (patient_id,))
-        return cursor.fetchone()
+    if diff:
+        cursor.execute(spec['select'], (patient_id,))
+        existing = cursor.fetchall()
+        keep = 0
+        while (keep < len(existing) and keep < len(rows)
+               and tuple(existing[keep])[1:] == rows[keep]):
+            keep += 1
+        cursor.executemany(spec['delete_row'], [(row['id'],) for row in existing[keep:]])
+        rows = rows[keep:]
+    else:
+        cursor.execute(spec['delete_all'], (patient_id,))
 
-def save_prescriptions(patient_id, prescriptions):
-    with db_connection() as cursor:
-        cursor.execute("DELETE FROM prescriptions WHERE patient_id = ?", (patient_id,))
-        for drug in prescriptions:
-            cursor.execute("""
-                INSERT INTO prescriptions (
-                    patient_id, drug_name, drug_form, strength, 
-                    dose, frequency, route, duration
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                patient_id,
-                drug['drug_name'],
-                drug['drug_form'],
-                drug['strength'],
-                drug['dose'],
-                drug['frequency'],
-                drug['route'],
-                drug['duration']
-            ))
+    cursor.executemany(spec['insert'], [(patient_id,) + row for row in rows])
+    return len(rows)
 
-def get_patient_prescriptions(patient_id):
-    with db_connection() as cursor:
-        cursor.execute("SELECT * FROM prescriptions WHERE patient_id = ?", (patient_id,))
-        return cursor.fetchall()
+def update_dropdown_order(category, ordered_items):
+    """Store the display order of a category's options (values, first to last)"""
+    try:
+        with db_connection() as cursor:
+            cursor.executemany(
+                "UPDATE dropdown_options SET display_order = ? WHERE category = ? AND value = ?",
+                [((position + 1) * DISPLAY_ORDER_GAP, category, value)
+                 for position, value in enumerate(ordered_items)]
+            )
+        _dropdown_cache.invalidate()
+        return True
+    except sqlite3.Error as e:
+        print(f"Order update failed: {e}")
+        return False
+
+# NOCASE only folds ASCII letters, so prefixes are folded the same way
+_NOCASE_FOLD = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
 
-def save_investigations(patient_id, investigations):
+def _prefix_bounds(prefix):
+    """(low, high) such that low <= value < high, under NOCASE, for values starting with prefix"""
+    low = prefix.translate(_NOCASE_FOLD)
+    following = chr(ord(low[-1]) + 1)
+    if following == "A":
+        # Upper case letters never occur after folding; '[' follows '@'
+        following = "["
+    return low, low[:-1] + following
+
+def search_dropdown_prefix(category, prefix, limit=50):
+    """Options of a category starting with prefix (ignoring ASCII case), alphabetically.
+
+    A range query on idx_dropdown_options_category_value_nocase, so the
+    cost depends on limit rather than the size of the category.
+    """
     with db_connection() as cursor:
-        cursor.execute("DELETE FROM investigations WHERE patient_id = ?", (patient_id,))
-        for test in investigations:
-            cursor.execute("""
-                INSERT INTO investigations (patient_id, name, value)
-                VALUES (?, ?, ?)
-            """, (patient_id, test['name'], test['value']))
+        if not prefix:
+            cursor.execute(
+                """SELECT value FROM dropdown_options WHERE category = ?
+                   ORDER BY value COLLATE NOCASE LIMIT ?""",
+                (category, limit)
+            )
+        else:
+            cursor.execute(
+                """SELECT value FROM dropdown_options
+                   WHERE category = ? AND value >= ? COLLATE NOCASE AND value < ? COLLATE NOCASE
+                   ORDER BY value COLLATE NOCASE LIMIT ?""",
+                (category, *_prefix_bounds(prefix), limit)
+            )
+        return [row[0] for row in cursor.fetchall()]
 
-def get_patient_investigations(patient_id):
+def import_dropdown_options(options, chunk_size=1000):
+    """Add many (category, value) pairs in one transaction.
+
+    options can be any iterable (e.g. a file reader); it is consumed in
+    chunks of chunk_size, so memory use does not grow with its length.
+    Existing options are left alone (INSERT OR IGNORE) and new ones are
+    appended to their category in the order given. Blank or non-text
+    entries are skipped. Returns counts: read, added, duplicates, invalid.
+    """
+    counts = {'read': 0, 'added': 0, 'duplicates': 0, 'invalid': 0}
+    next_rank = {}
+    options = iter(options)
     with db_connection() as cursor:
-        cursor.execute("SELECT * FROM investigations WHERE patient_id = ?", (patient_id,))
-        return cursor.fetchall()
+        while True:
+            chunk = list(itertools.islice(options, chunk_size))
+            if not chunk:
+                break
+            rows = []
+            for category, value in chunk:
+                if not isinstance(category, str) or not isinstance(value, str):
+                    counts['invalid'] += 1
+                    continue
+                category = category.strip()
+                value = value.strip()
+                if not category or not value:
+                    counts['invalid'] += 1
+                    continue
+                if category not in next_rank:
+                    cursor.execute(
+                        "SELECT COALESCE(MAX(display_order), 0) FROM dropdown_options WHERE category = ?",
+                        (category,)
+                    )
+                    next_rank[category] = cursor.fetchone()[0]
+                next_rank[category] += DISPLAY_ORDER_GAP
+                rows.append((category, value, next_rank[category]))
+            counts['read'] += len(chunk)
+            if rows:
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO dropdown_options (category, value, display_order) VALUES (?, ?, ?)",
+                    rows
+                )
+                counts['added'] += cursor.rowcount
+                counts['duplicates'] += len(rows) - cursor.rowcount
+    if counts['added']:
+        _dropdown_cache.invalidate()
+    return counts
 
-def get_print_history(patient_id):
+def iter_dropdown_options(categories=None, batch_size=1000):
+    """Yield (category, value) for every option in display order.
+
+    Rows are read batch_size at a time with a keyset query per batch, so
+    no transaction stays open between batches.
+    """
+    if categories is None:
+        with db_connection() as cursor:
+            cursor.execute("SELECT DISTINCT category FROM dropdown_options ORDER BY category")
+            categories = [row[0] for row in cursor.fetchall()]
+
+    for category in categories:
+        # Rows added by other tools may have no rank; they are shown first
+        with db_connection() as cursor:
+            cursor.execute(
+                "SELECT value FROM dropdown_options WHERE category = ? AND display_order IS NULL ORDER BY value",
+                (category,)
+            )
+            unranked = cursor.fetchall()
+        for row in unranked:
+            yield category, row[0]
+
+        after = None
+        while True:
+            with db_connection() as cursor:
+                if after is None:
+                    cursor.execute(
+                        """SELECT value, display_order FROM dropdown_options
+                           WHERE category = ? AND display_order IS NOT NULL
+                           ORDER BY display_order, value LIMIT ?""",
+                        (category, batch_size)
+                    )
+                else:
+                    cursor.execute(
+                        """SELECT value, display_order FROM dropdown_options
+                           WHERE category = ? AND (display_order, value) > (?, ?)
+                           ORDER BY display_order, value LIMIT ?""",
+                        (category, after[1], after[0], batch_size)
+                    )
+                rows = cursor.fetchall()
+            for row in rows:
+                yield category, row[0]
+            if len(rows) < batch_size:
+                break
+            after = tuple(rows[-1])
+
+def move_dropdown_option(category, value, offset):
+    """Move an option one place up (offset=-1) or down (offset=1).
+
+    Only the moved row is written: it gets a rank halfway between its new
+    neighbours. When two neighbours have no gap left the category is
+    renumbered first. Returns False if the option is missing or already
+    at that end of the list.
+    """
+    if offset not in (-1, 1):
+        raise ValueError("offset must be -1 or 1")
     with db_connection() as cursor:
+        rank, renumber = _rank_after_move(cursor, category, value, offset)
+        if renumber:
+            _renumber_display_order(cursor, category)
+            rank, _ = _rank_after_move(cursor, category, value, offset)
+        if rank is None:
+            return False
         cursor.execute(
-            "SELECT * FROM report_history WHERE patient_id = ? ORDER BY printed_at DESC",
-            (patient_id,)
+            "UPDATE dropdown_options SET display_order = ? WHERE category = ? AND value = ?",
+            (rank, category, value)
         )
-        return cursor.fetchall()
+    _dropdown_cache.invalidate()
+    return True
 
-# Initialize the database
-if not os.path.exists(DB_PATH):
-    initialize_database()
-    
-# database.py (new function)
-def update_dropdown_order(category, ordered_items):
-    """Update the display order of dropdown options"""
-    try:
-        # Clear existing order
-        cursor.execute("DELETE FROM dropdown_options WHERE category=?", (category,))
-        
-        # Reinsert items in new order
-        for order_index, item in enumerate(ordered_items):
-            cursor.execute(
-                "INSERT INTO dropdown_options (category, option, display_order) VALUES (?, ?, ?)",
-                (category, item, order_index)
-            )
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Order update failed: {e}")
-        return False
+def _rank_after_move(cursor, category, value, offset):
+    """(new rank or None, whether the category must be renumbered first)"""
+    # Rows added by other tools may have no rank yet
+    cursor.execute(
+        "SELECT 1 FROM dropdown_options WHERE category = ? AND display_order IS NULL LIMIT 1",
+        (category,)
+    )
+    if cursor.fetchone():
+        return None, True
+
+    cursor.execute(
+        "SELECT display_order FROM dropdown_options WHERE category = ? AND value = ?",
+        (category, value)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None, False
+    current = row[0]
+
+    # The two options the moved one will sit between
+    if offset < 0:
+        cursor.execute(
+            """SELECT display_order FROM dropdown_options
+               WHERE category = ? AND (display_order, value) < (?, ?)
+               ORDER BY display_order DESC, value DESC LIMIT 2""",
+            (category, current, value)
+        )
+    else:
+        cursor.execute(
+            """SELECT display_order FROM dropdown_options
+               WHERE category = ? AND (display_order, value) > (?, ?)
+               ORDER BY display_order, value LIMIT 2""",
+            (category, current, value)
+        )
+    neighbours = [row[0] for row in cursor.fetchall()]
+    if not neighbours:
+        return None, False  # Already first/last
+    near = neighbours[0]
+    far = neighbours[1] if len(neighbours) > 1 else near + offset * 2 * DISPLAY_ORDER_GAP
+    if abs(far - near) < 2:
+        return None, True
+    return (near + far) // 2, False
+
+def _renumber_display_order(cursor, category):
+    # Ranked in Python: UPDATE ... FROM would need SQLite 3.33
+    cursor.execute(
+        "SELECT id FROM dropdown_options WHERE category = ? ORDER BY display_order, value",
+        (category,)
+    )
+    cursor.executemany(
+        "UPDATE dropdown_options SET display_order = ? WHERE id = ?",
+        [((position + 1) * DISPLAY_ORDER_GAP, row[0]) for position, row in enumerate(cursor.fetchall())]
+    )
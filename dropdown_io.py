@@ -0,0 +1,139 @@
+# dropdown_io.py
+import csv
+import json
+import os
+import database
+
+# Bulk import/export of dropdown options. Files are read and written one
+# record at a time, so a national formulary of tens of thousands of
+# entries never has to fit in memory.
+#
+#   .csv          header row with "category" and "value" columns
+#   .json         array of {"category": ..., "value": ...} objects
+#   .jsonl        one such object per line
+#
+# When importing, a file (or record) without a category uses the category
+# passed in, and plain strings are accepted in place of objects, so a
+# simple list of drug names can be loaded into "drug_name" directly.
+
+FILE_FILTER = "Dropdown lists (*.csv *.json *.jsonl);;CSV (*.csv);;JSON (*.json *.jsonl)"
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def _file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension == ".json":
+        return "json"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Unsupported file type: {extension or path} (use .csv, .json or .jsonl)")
+
+def _record_option(record, category):
+    if isinstance(record, str):
+        return category, record
+    if isinstance(record, dict):
+        return record.get("category") or category, record.get("value")
+    raise ValueError(f"Unexpected entry: {record!r}")
+
+def _iter_csv(f, category):
+    reader = csv.reader(f)
+    first_row = next(reader, [])
+    header = [name.strip().lower() for name in first_row]
+    if "value" in header:
+        value_column = header.index("value")
+        category_column = header.index("category") if "category" in header else None
+    elif len(header) == 1:
+        # A single unnamed column of values; the first row is data too
+        value_column, category_column = 0, None
+        yield category, first_row[0]
+    else:
+        raise ValueError("CSV files need a 'value' column (and optionally 'category').")
+
+    for row in reader:
+        if not row:
+            continue
+        value = row[value_column] if value_column < len(row) else ""
+        row_category = row[category_column] if category_column is not None and category_column < len(row) else ""
+        yield row_category or category, value
+
+def _iter_json_array(f):
+    """Decode the elements of a top-level JSON array one at a time"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+    while True:
+        # Skip whitespace and separators, reading more text when needed
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            chunk = f.read(READ_CHUNK_SIZE)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+
+        if position >= len(buffer):
+            raise ValueError("Unexpected end of JSON file")
+        if not started:
+            if buffer[position] != "[":
+                raise ValueError("JSON files must contain an array of entries.")
+            started = True
+            position += 1
+            continue
+        if buffer[position] == "]":
+            return
+
+        try:
+            element, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Element continues past the end of the buffer
+            chunk = f.read(READ_CHUNK_SIZE)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+        yield element
+        position = end
+
+def read_options(path, category=None):
+    """Yield (category, value) pairs from a CSV or JSON file"""
+    file_format = _file_format(path)
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if file_format == "csv":
+            yield from _iter_csv(f, category)
+        elif file_format == "json":
+            for record in _iter_json_array(f):
+                yield _record_option(record, category)
+        else:
+            for line in f:
+                if line.strip():
+                    yield _record_option(json.loads(line), category)
+
+def import_options(path, category=None):
+    """Import a file into dropdown_options in one transaction; returns the counts"""
+    return database.import_dropdown_options(read_options(path, category))
+
+def export_options(path, categories=None):
+    """Write options (all categories by default) in display order; returns the count"""
+    file_format = _file_format(path)
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        options = database.iter_dropdown_options(categories)
+        if file_format == "csv":
+            writer = csv.writer(f)
+            writer.writerow(["category", "value"])
+            for count, (category, value) in enumerate(options, 1):
+                writer.writerow([category, value])
+        elif file_format == "json":
+            f.write("[")
+            for count, (category, value) in enumerate(options, 1):
+                f.write("," if count > 1 else "")
+                f.write("\n" + json.dumps({"category": category, "value": value}, ensure_ascii=False))
+            f.write("\n]\n")
+        else:
+            for count, (category, value) in enumerate(options, 1):
+                f.write(json.dumps({"category": category, "value": value}, ensure_ascii=False) + "\n")
+    return count
@@ -0,0 +1,168 @@
+# dropdown_models.py
+import weakref
+from collections import OrderedDict
+from PyQt5 import sip
+from PyQt5.QtCore import Qt, QModelIndex, QStringListModel
+from PyQt5.QtWidgets import QCompleter
+import database
+
+# Large categories (see database.LARGE_DROPDOWN_CATEGORY) are not loaded
+# into their combos. The combo becomes editable and suggests up to
+# COMPLETER_LIMIT matches for what has been typed, found with an indexed
+# prefix query.
+COMPLETER_LIMIT = 50
+PREFIX_CACHE_SIZE = 64      # Recent prefixes remembered per category
+
+
+class DropdownModel(QStringListModel):
+    """Options of one dropdown category, shared by every combo box showing it.
+
+    Row 0 is the empty "nothing selected" entry when with_empty is set.
+    refresh() applies changes as row moves, inserts and removals rather than
+    a reset, so a combo showing an option that was only moved stays on it.
+    A combo whose option was deleted is put back on row 0 by
+    refresh_dropdown_models().
+    """
+
+    def __init__(self, category, with_empty=True, parent=None):
+        super().__init__(parent)
+        self.category = category
+        self.with_empty = with_empty
+        self.setStringList(self._load())
+
+    def _load(self):
+        options = database.get_dropdown_options(self.category)
+        return [""] + options if self.with_empty else options
+
+    def refresh(self):
+        old = self.stringList()
+        new = self._load()
+        if old == new:
+            return
+        # Drop options that are gone, backwards so row numbers stay valid
+        wanted = set(new)
+        for row in reversed(range(len(old))):
+            if old[row] not in wanted:
+                self.removeRows(row, 1)
+        # Then put the rows into the new order one at a time; a moved row
+        # keeps its persistent index, and with it any combo's selection
+        for row, value in enumerate(new):
+            current = self.stringList()
+            if row < len(current) and current[row] == value:
+                continue
+            if value in current[row:]:
+                self.moveRows(QModelIndex(), current.index(value, row), 1, QModelIndex(), row)
+            else:
+                self.insertRows(row, 1)
+                self.setData(self.index(row), value)
+
+
+class PrefixCompletionModel(QStringListModel):
+    """Suggestions for one category, holding only the matches for the current prefix"""
+
+    def __init__(self, category, parent=None):
+        super().__init__(parent)
+        self.category = category
+        self._cache = OrderedDict()     # lower-cased prefix -> matches
+
+    def set_prefix(self, text):
+        key = text.lower()
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            matches = self._cache[key]
+        else:
+            matches = database.search_dropdown_prefix(self.category, text, COMPLETER_LIMIT)
+            self._cache[key] = matches
+            while len(self._cache) > PREFIX_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        if matches != self.stringList():
+            self.setStringList(matches)
+
+    def refresh(self):
+        self._cache.clear()
+
+
+_models = {}
+_completion_models = {}
+_bound_combos = weakref.WeakKeyDictionary()   # combo -> (category, with_empty, large)
+
+def dropdown_model(category, with_empty=True):
+    """Return the shared model for a category, creating it on first use"""
+    key = (category, with_empty)
+    if key not in _models:
+        _models[key] = DropdownModel(category, with_empty)
+    return _models[key]
+
+def completion_model(category):
+    """Return the shared type-ahead model for a category"""
+    if category not in _completion_models:
+        _completion_models[category] = PrefixCompletionModel(category)
+    return _completion_models[category]
+
+def bind_combo(combo, category, with_empty=True):
+    """Show a category's shared options in a combo box.
+
+    Bound combos must not be filled with addItem()/clear(); those would
+    modify the shared model for every other combo as well. Large categories
+    get an editable combo with type-ahead suggestions instead of a list;
+    refresh_dropdown_models() switches a combo over when its category
+    grows past (or shrinks below) the threshold.
+    """
+    large = database.is_large_dropdown_category(category)
+    if large:
+        _bind_completer(combo, category)
+        combo.clearEditText()
+    else:
+        _bind_list(combo, category, with_empty)
+        combo.setCurrentIndex(0)
+    _bound_combos[combo] = (category, with_empty, large)
+
+def _bind_list(combo, category, with_empty):
+    if combo.isEditable():
+        combo.setCompleter(None)
+        combo.setEditable(False)  # Also deletes the line edit and its connections
+    combo.setModel(dropdown_model(category, with_empty))
+
+def _bind_completer(combo, category):
+    model = completion_model(category)
+    combo.setModel(QStringListModel(combo))  # Off the shared list model
+    combo.setEditable(True)
+    combo.setInsertPolicy(combo.NoInsert)
+    completer = QCompleter(model, combo)
+    completer.setCaseSensitivity(Qt.CaseInsensitive)
+    completer.setCompletionMode(QCompleter.PopupCompletion)
+    completer.setMaxVisibleItems(15)
+    combo.setCompleter(completer)
+    # textEdited arrives before the line edit asks the completer for matches,
+    # so the model already holds the results for the new prefix
+    combo.lineEdit().textEdited.connect(model.set_prefix)
+
+def refresh_dropdown_models(categories=None):
+    """Refresh the shared models (all of them, or just the given categories).
+
+    Every bound combo keeps the option it showed; if that option was
+    deleted it goes back to row 0. Combos of a category that crossed
+    database.LARGE_DROPDOWN_CATEGORY are switched between the list and
+    type-ahead modes, keeping their text.
+    """
+    selections = [
+        (combo, binding, combo.currentText()) for combo, binding in list(_bound_combos.items())
+        if not sip.isdeleted(combo) and (categories is None or binding[0] in categories)
+    ]
+    for (category, _), model in list(_models.items()):
+        if categories is None or category in categories:
+            model.refresh()
+    for category, model in list(_completion_models.items()):
+        if categories is None or category in categories:
+            model.refresh()
+    large_categories = {}
+    for combo, (category, with_empty, large), text in selections:
+        if category not in large_categories:
+            large_categories[category] = database.is_large_dropdown_category(category)
+        if large_categories[category] != large:
+            bind_combo(combo, category, with_empty)
+        if combo.isEditable():
+            combo.setEditText(text)
+        elif combo.currentText() != text:
+            index = combo.findText(text)
+            combo.setCurrentIndex(index if index >= 0 else 0)
@@ -0,0 +1,53 @@
+# import_profile.py
+import atexit
+import builtins
+import sys
+import threading
+import time
+
+# Measures how long each module takes to import the first time.
+# Enabled by starting main_window.py with --import-profile; report() prints
+# what startup imported, and whatever is imported later (on first use of
+# printing, preview, ...) is printed when the application exits.
+
+_original_import = builtins.__import__
+_timings = {}           # module name -> (cumulative seconds, own seconds)
+_reported = set()
+_local = threading.local()
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(0.0)  # Time spent in nested imports
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        _timings.setdefault(name, (elapsed, elapsed - nested))
+
+def install():
+    if builtins.__import__ is not _timed_import:
+        builtins.__import__ = _timed_import
+        atexit.register(report, "Imported after startup")
+
+def report(title="Import times", limit=25):
+    """Print modules not yet reported, slowest first, to stderr"""
+    names = [name for name in _timings if name not in _reported]
+    _reported.update(names)
+    if not names:
+        return
+    names.sort(key=lambda name: _timings[name][0], reverse=True)
+    total = sum(_timings[name][1] for name in names)
+
+    print(f"\n{title}: {len(names)} modules, {total * 1000:.0f} ms", file=sys.stderr)
+    print(f"{'cumulative':>12} {'self':>9}  module", file=sys.stderr)
+    for name in names[:limit]:
+        cumulative, own = _timings[name]
+        print(f"{cumulative * 1000:9.1f} ms {own * 1000:6.1f} ms  {name}", file=sys.stderr)
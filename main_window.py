@@ -2,6 +2,10 @@
 import subprocess
 import sys
 import os
+# Must be installed before anything else is imported to time it
+if "--import-profile" in sys.argv:
+    import import_profile
+    import_profile.install()
 #from PyQt5.QtCore import QCoreApplication, Qt
 #QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)  # Must come before QApplication is created
 #QCoreApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
@@ -15,7 +19,10 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import QDate, Qt, QDateTime, pyqtSignal
 import database
 from admin_window import AdminWindow
-from print_manager import PrintManager
+from search_dialog import PatientSearchDialog
+from dropdown_models import bind_combo, refresh_dropdown_models
+
+INVESTIGATION_SEARCH_LIMIT = 200  # Matches listed at a time for a large investigation list
 
 class PrescriptionWidget(QWidget):
     removed = pyqtSignal(QWidget)  # Signal for safe removal
@@ -48,6 +55,10 @@ class PrescriptionWidget(QWidget):
         self.remove_btn.clicked.connect(self.delete_self)
         self.layout.addWidget(self.remove_btn)
         
+        # All rows share one options model per category
+        for field in ['drug_name', 'drug_form', 'frequency', 'route']:
+            bind_combo(getattr(self, field), field)
+        
         self.setFixedHeight(40)
   
     def delete_self(self):
@@ -73,12 +84,9 @@ class MainWindow(QMainWindow):
         self.hospital_combo = QComboBox()
         self.unit_combo = QComboBox()
         
-        # Add empty items first
-        self.hospital_combo.addItem("")
-        self.unit_combo.addItem("")
-        
-        self.hospital_combo.addItems(database.get_dropdown_options("hospital_name"))
-        self.unit_combo.addItems(database.get_dropdown_options("unit_name"))
+        # Shared option models (with an empty first item)
+        bind_combo(self.hospital_combo, "hospital_name")
+        bind_combo(self.unit_combo, "unit_name")
         
         # Set to first item if available
         if self.hospital_combo.count() > 1:  # Account for empty item
@@ -184,8 +192,7 @@ class MainWindow(QMainWindow):
         group_layout.addRow("Age:", self.age_input)
 
         self.sex_combo = QComboBox()
-        self.sex_combo.addItem("")  # Add empty item first
-        self.sex_combo.addItems(["Male", "Female"])
+        bind_combo(self.sex_combo, "sex")
         group_layout.addRow("Sex:", self.sex_combo)
 
         self.bht_input = QLineEdit()
@@ -212,14 +219,14 @@ class MainWindow(QMainWindow):
         medical_layout = QFormLayout(medical_group)
 
         self.indication_combo = QComboBox()
-        self.indication_combo.addItem("")  # Add empty item
+        bind_combo(self.indication_combo, "indication")
         medical_layout.addRow("Indication:", self.indication_combo)
 
         self.history_input = QLineEdit()
         medical_layout.addRow("History & Examination:", self.history_input)
 
         self.management_combo = QComboBox()
-        self.management_combo.addItem("")  # Add empty item
+        bind_combo(self.management_combo, "management")
         medical_layout.addRow("Management:", self.management_combo)
 
         layout.addWidget(medical_group)
@@ -230,23 +237,23 @@ class MainWindow(QMainWindow):
         layout = QFormLayout(self.operations_tab)
         
         self.surgeon_combo = QComboBox()
-        self.surgeon_combo.addItem("")  # Add empty item
+        bind_combo(self.surgeon_combo, "surgeon")
         layout.addRow("Surgeon:", self.surgeon_combo)
         
         self.anaesthetist_combo = QComboBox()
-        self.anaesthetist_combo.addItem("")  # Add empty item
+        bind_combo(self.anaesthetist_combo, "anaesthetist")
         layout.addRow("Anaesthetist:", self.anaesthetist_combo)
         
         self.anaesthesia_combo = QComboBox()
-        self.anaesthesia_combo.addItem("")  # Add empty item
+        bind_combo(self.anaesthesia_combo, "anaesthesia_type")
         layout.addRow("Type of Anaesthesia:", self.anaesthesia_combo)
         
         self.surgery_name_combo = QComboBox()
-        self.surgery_name_combo.addItem("")  # Add empty item
+        bind_combo(self.surgery_name_combo, "surgery_name")
         layout.addRow("Surgery/Procedure Name:", self.surgery_name_combo)
         
         self.surgery_desc_combo = QComboBox()
-        self.surgery_desc_combo.addItem("")  # Add empty item
+        bind_combo(self.surgery_desc_combo, "surgery_description")
         layout.addRow("Description:", self.surgery_desc_combo)    
         
         from PyQt5.QtWidgets import QGroupBox, QLineEdit, QPushButton, QHBoxLayout, QListWidget, QListWidgetItem
@@ -258,7 +265,7 @@ class MainWindow(QMainWindow):
         # Entry layout
         entry_layout = QHBoxLayout()
         self.op_var_name_combo = QComboBox()
-        self.op_var_name_combo.addItems(database.get_dropdown_options("op_variable"))
+        bind_combo(self.op_var_name_combo, "op_variable", with_empty=False)
         entry_layout.addWidget(self.op_var_name_combo)
 
         self.op_var_value_input = QLineEdit()
@@ -346,110 +353,20 @@ class MainWindow(QMainWindow):
         self.next_appointment.setDisplayFormat("yyyy-MM-dd HH:mm")  # ✅ this is important
         layout.addRow("Next Appointment:", self.next_appointment)
 
-    def load_dropdowns(self):
-        # Store current selections before updating
-        main_dropdown_selections = {}
-        dropdown_map = {
-            "sex": self.sex_combo,
-            "surgeon": self.surgeon_combo,
-            "anaesthetist": self.anaesthetist_combo,
-            "anaesthesia_type": self.anaesthesia_combo,
-            "surgery_name": self.surgery_name_combo,
-            "surgery_description": self.surgery_desc_combo,
-            "indication": self.indication_combo,
-            "management": self.management_combo
-        }
+    def load_dropdowns(self, categories=None):
+        """Refresh the shared option models; pass a set of categories to limit it.
+
+        Models are updated in place, so every combo (including each
+        prescription row) keeps its current selection.
+        """
+        self._dropdown_version = database.dropdown_version()
+        refresh_dropdown_models(categories)
         
-        # Store current selections for main dropdowns
-        for category, combo in dropdown_map.items():
-            main_dropdown_selections[category] = combo.currentText()
-        
-        # Store current selections for prescription widgets
-        prescription_selections = []
-        for widget in self.prescription_widgets:
-            if widget.parent():  # Only consider widgets that are still in the layout
-                selections = {
-                    'drug_name': widget.drug_name.currentText(),
-                    'drug_form': widget.drug_form.currentText(),
-                    'frequency': widget.frequency.currentText(),
-                    'route': widget.route.currentText()
-                }
-                prescription_selections.append(selections)
-        
-        # Update main dropdowns
-        for category, combo in dropdown_map.items():
-            combo.blockSignals(True)  # Prevent change signals during update
-            
-            # Preserve the empty first item
-            current_index = combo.currentIndex()
-            current_text = combo.currentText()
-            combo.clear()
-            combo.addItem("")  # Add empty item back
-            
-            # Add options
-            options = database.get_dropdown_options(category)
-            combo.addItems(options)
-            
-            # Restore previous selection if it still exists
-            if main_dropdown_selections[category] and main_dropdown_selections[category] != "":
-                index = combo.findText(main_dropdown_selections[category])
-                if index >= 0:
-                    combo.setCurrentIndex(index)
-                else:
-                    combo.setCurrentIndex(0)  # Set to empty if not found
-            else:
-                combo.setCurrentIndex(0)  # Set to empty
-            
-            combo.blockSignals(False)
-        
-        # Update prescription widgets
-        for i, widget in enumerate(self.prescription_widgets):
-            if widget.parent():  # Only update widgets still in the layout
-                for field in ['drug_name', 'drug_form', 'frequency', 'route']:
-                    widget_combo = getattr(widget, field)
-                    widget_combo.blockSignals(True)
-                    
-                    # Preserve current selection
-                    current_text = widget_combo.currentText()
-                    widget_combo.clear()
-                    widget_combo.addItem("")  # Add empty item
-                    
-                    # Add options
-                    widget_combo.addItems(database.get_dropdown_options(field))
-                    
-                    # Restore previous selection if it still exists
-                    if i < len(prescription_selections):
-                        prev_text = prescription_selections[i][field]
-                        if prev_text and prev_text != "":
-                            index = widget_combo.findText(prev_text)
-                            if index >= 0:
-                                widget_combo.setCurrentIndex(index)
-                            else:
-                                widget_combo.setCurrentIndex(0)  # Set to empty
-                        else:
-                            widget_combo.setCurrentIndex(0)  # Set to empty
-                    else:
-                        widget_combo.setCurrentIndex(0)  # Set to empty
-                    
-                    widget_combo.blockSignals(False)
-        
-        # Update prescription widgets
-        for i, widget in enumerate(self.prescription_widgets):
-            if widget.parent():  # Only update widgets still in the layout
-                for field in ['drug_name', 'drug_form', 'frequency', 'route']:
-                    widget_combo = getattr(widget, field)
-                    widget_combo.blockSignals(True)
-                    widget_combo.clear()
-                    widget_combo.addItems(database.get_dropdown_options(field))
-                    
-                    # Restore previous selection if it still exists
-                    if i < len(prescription_selections):
-                        prev_text = prescription_selections[i][field]
-                        if prev_text:
-                            index = widget_combo.findText(prev_text)
-                            if index >= 0:
-                                widget_combo.setCurrentIndex(index)
-                    widget_combo.blockSignals(False)
+    def refresh_changed_dropdowns(self):
+        """Reload only the categories changed since the last load"""
+        changed = database.changed_dropdown_categories(self._dropdown_version)
+        if changed:
+            self.load_dropdowns(changed)
         
     def add_prescription_row(self):
         widget = PrescriptionWidget()
@@ -457,18 +374,6 @@ class MainWindow(QMainWindow):
         self.prescription_layout.addWidget(widget)
         self.prescription_widgets.append(widget)
         
-        # Clear existing items and add empty item first
-        for field in ['drug_name', 'drug_form', 'frequency', 'route']:
-            combo = getattr(widget, field)
-            combo.clear()
-            combo.addItem("")  # Add empty item
-        
-        # Load dropdown options
-        widget.drug_name.addItems(database.get_dropdown_options("drug_name"))
-        widget.drug_form.addItems(database.get_dropdown_options("drug_form"))
-        widget.frequency.addItems(database.get_dropdown_options("frequency"))
-        widget.route.addItems(database.get_dropdown_options("route"))
-        
         # Set to empty selection
         widget.drug_name.setCurrentIndex(0)
         widget.drug_form.setCurrentIndex(0)
@@ -493,9 +398,20 @@ class MainWindow(QMainWindow):
         layout = QVBoxLayout(dialog)
         
         layout.addWidget(QLabel("Select Investigation:"))
+        investigation_filter = QLineEdit()
+        investigation_filter.setPlaceholderText("Type to filter...")
+        investigation_filter.setClearButtonEnabled(True)
+        layout.addWidget(investigation_filter)
         self.investigation_select = QListWidget()
-        self.investigation_select.addItems(database.get_dropdown_options("investigation"))
         self.investigation_select.setSelectionMode(QAbstractItemView.MultiSelection)
+        self.investigation_select.setUniformItemSizes(True)
+        # A large list is searched by prefix instead of being loaded whole
+        self._search_investigations = database.is_large_dropdown_category("investigation")
+        if self._search_investigations:
+            self.filter_investigations("")
+        else:
+            self.investigation_select.addItems(database.get_dropdown_options("investigation"))
+        investigation_filter.textChanged.connect(self.filter_investigations)
         layout.addWidget(self.investigation_select)
         
         layout.addWidget(QLabel("Value:"))
@@ -509,6 +425,22 @@ class MainWindow(QMainWindow):
         
         dialog.exec_()
 
+    def filter_investigations(self, text):
+        """Show the investigations matching the text; selections are kept"""
+        if self._search_investigations:
+            selected = {item.text() for item in self.investigation_select.selectedItems()}
+            for row in reversed(range(self.investigation_select.count())):
+                if not self.investigation_select.item(row).isSelected():
+                    self.investigation_select.takeItem(row)
+            matches = database.search_dropdown_prefix("investigation", text.strip(), INVESTIGATION_SEARCH_LIMIT)
+            self.investigation_select.addItems([value for value in matches if value not in selected])
+            return
+
+        text = text.strip().lower()
+        for row in range(self.investigation_select.count()):
+            item = self.investigation_select.item(row)
+            item.setHidden(bool(text) and text not in item.text().lower())
+
     def save_investigations(self, dialog):
         selected = [item.text() for item in self.investigation_select.selectedItems()]
         value = self.investigation_value.text().strip()
@@ -537,7 +469,7 @@ class MainWindow(QMainWindow):
     def open_admin_panel(self):
         # Create admin window as modal dialog with parent
         admin_dialog = AdminWindow(self)  # Pass self as parent
-        admin_dialog.data_updated.connect(self.load_dropdowns)
+        admin_dialog.data_updated.connect(self.refresh_changed_dropdowns)
         
         # Set window flags to make it a proper dialog
         admin_dialog.setWindowModality(Qt.ApplicationModal)
@@ -609,52 +541,35 @@ class MainWindow(QMainWindow):
             name, value = item.text().split(': ', 1)
             investigations.append({'name': name, 'value': value.strip()})
         
-        # Save to database
+        # Collect operation variables
+        op_variables = []
+        for i in range(self.op_variable_list.count()):
+            name, value = self.op_variable_list.item(i).data(Qt.UserRole)
+            op_variables.append({'name': name, 'value': value})
+        
+        # Save to database - the whole encounter is written in one transaction
         try:
             if self.current_patient_id is None:
                 # New patient
-                patient_id = database.save_patient(patient_data)
+                patient_id = database.save_encounter(
+                    patient_data, operation_data, prescriptions, investigations, op_variables
+                )
                 if patient_id is None:
                     QMessageBox.warning(self, "Duplicate BHT", "BHT number already exists!")
                     return
-                    
-                # Save related records
-                database.save_operation(patient_id, operation_data)
-                database.save_prescriptions(patient_id, prescriptions)
-                database.save_investigations(patient_id, investigations)
-
-                # ✅ Save operation variables
-                database.delete_op_variables(patient_id)
-                for name, widget in self.op_variable_widgets.items():
-                    value = widget.currentText()
-                    if value:
-                        database.add_op_variable(patient_id, name, value)
                 
                 self.current_patient_id = patient_id
                 QMessageBox.information(self, "Success", "New patient record saved successfully!")
             
             else:
                 # Update existing patient
-                if not database.update_patient(self.current_patient_id, patient_data):
+                patient_id = database.update_encounter(
+                    self.current_patient_id, patient_data, operation_data,
+                    prescriptions, investigations, op_variables
+                )
+                if patient_id is None:
                     QMessageBox.warning(self, "Duplicate BHT", "BHT number already exists!")
                     return
-                    
-                # Update related records
-                operation = database.get_patient_operation(self.current_patient_id)
-                if operation:
-                    database.update_operation(operation['id'], operation_data)
-                else:
-                    database.save_operation(self.current_patient_id, operation_data)
-                
-                database.save_prescriptions(self.current_patient_id, prescriptions)
-                database.save_investigations(self.current_patient_id, investigations)
-               
-                # ✅ Save operation variables
-                database.delete_op_variables(self.current_patient_id)
-                for i in range(self.op_variable_list.count()):
-                    item = self.op_variable_list.item(i)
-                    name, value = item.data(Qt.UserRole)
-                    database.add_op_variable(self.current_patient_id, name, value)
 
                 QMessageBox.information(self, "Success", "Patient record updated successfully!")
                 
@@ -663,57 +578,23 @@ class MainWindow(QMainWindow):
             print(f"Database error: {e}")
 
     def edit_record(self):
-        # Create search dialog
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Search Patient")
-        dialog.setMinimumWidth(400)
-        layout = QVBoxLayout(dialog)
-        
-        # Search input
-        layout.addWidget(QLabel("Search by Name or BHT:"))
-        self.search_input = QLineEdit()
-        self.search_input.textChanged.connect(self.search_patients)
-        layout.addWidget(self.search_input)
-        
-        # Results list
-        self.search_results = QListWidget()
-        layout.addWidget(self.search_results)
-        
-        # Buttons
-        btn_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-        btn_box.accepted.connect(lambda: self.load_selected_patient(dialog))
-        btn_box.rejected.connect(dialog.reject)
-        layout.addWidget(btn_box)
-        
-        dialog.exec_()
-
-    def search_patients(self):
-        search_term = self.search_input.text().strip()
-        self.search_results.clear()
-        
-        if search_term:
-            results = database.search_patients(search_term)
-            for patient in results:
-                item = QListWidgetItem(f"{patient['name']} (BHT: {patient['bht_no']})")
-                item.setData(Qt.UserRole, patient['id'])
-                self.search_results.addItem(item)
-
-    def load_selected_patient(self, dialog):
-        selected = self.search_results.selectedItems()
-        if not selected:
-            QMessageBox.warning(self, "Selection Error", "Please select a patient!")
-            return
-            
-        patient_id = selected[0].data(Qt.UserRole)
-        self.load_patient_data(patient_id)
-        dialog.accept()
+        # Search runs debounced on a worker thread (see search_dialog.py)
+        dialog = PatientSearchDialog(self)
+        if dialog.exec_() == QDialog.Accepted:
+            self.load_patient_data(dialog.selected_patient_id())
 
     def load_patient_data(self, patient_id):
         # Clear current form
         self.clear_form()
         
+        # Load the patient and all related records in one round trip
+        bundle = database.load_patient_bundle(patient_id)
+        if bundle is None:
+            QMessageBox.warning(self, "Not Found", "Patient record no longer exists!")
+            return
+        
         # Load patient data
-        patient = database.get_patient(patient_id)
+        patient = bundle.patient
         if patient:
             self.current_patient_id = patient['id']
             self.name_input.setText(patient['name'])
@@ -728,7 +609,7 @@ class MainWindow(QMainWindow):
             self.next_appointment.setDateTime(QDateTime.fromString(patient['next_appointment'], Qt.ISODate))
         
         # Load operation data
-        operation = database.get_patient_operation(patient_id)
+        operation = bundle.operation
         if operation:
             self.surgeon_combo.setCurrentText(operation['surgeon'])
             self.anaesthetist_combo.setCurrentText(operation['anaesthetist'])
@@ -737,7 +618,7 @@ class MainWindow(QMainWindow):
             self.surgery_desc_combo.setCurrentText(operation['surgery_description'])
 
         # ✅ Load op_variables for ureters, bladder, prostate, uoo
-        op_vars = database.get_op_variables(patient_id)
+        op_vars = bundle.op_variables
         for var in op_vars:
             name = var["name"]
             value = var["value"]
@@ -750,7 +631,6 @@ class MainWindow(QMainWindow):
         self.op_variable_list.clear()
 
         # ✅ Load op_variables into the list
-        op_vars = database.get_op_variables(patient_id)
         for var in op_vars:
             name = var["name"]
             value = var["value"]
@@ -759,7 +639,7 @@ class MainWindow(QMainWindow):
             self.op_variable_list.addItem(item)
                     
        # Load prescriptions
-        prescriptions = database.get_patient_prescriptions(patient_id)
+        prescriptions = bundle.prescriptions
         self.prescription_widgets = []
         
         # Clear existing widgets
@@ -773,13 +653,7 @@ class MainWindow(QMainWindow):
             widget = PrescriptionWidget()
             widget.removed.connect(self.remove_prescription_widget)
 
-            # ✅ Load dropdown options before setting values
-            widget.drug_name.addItems(database.get_dropdown_options("drug_name"))
-            widget.drug_form.addItems(database.get_dropdown_options("drug_form"))
-            widget.frequency.addItems(database.get_dropdown_options("frequency"))
-            widget.route.addItems(database.get_dropdown_options("route"))
-
-            # ✅ Now set values safely
+            # ✅ Options come from the shared models; set values
             widget.drug_name.setCurrentText(drug['drug_name'])
             widget.drug_form.setCurrentText(drug['drug_form'])
             widget.strength.setText(drug['strength'])
@@ -797,7 +671,7 @@ class MainWindow(QMainWindow):
             self.add_prescription_row()
         
         # Load investigations
-        investigations = database.get_patient_investigations(patient_id)
+        investigations = bundle.investigations
         self.investigations_list.clear()
         for test in investigations:
             self.investigations_list.addItem(f"{test['name']}: {test['value']}")
@@ -823,20 +697,10 @@ class MainWindow(QMainWindow):
     # In your MainWindow class:
     def clear_dropdown(self, combo):
         """Clear a dropdown selection reliably"""
-        # Save current index and block signals
-        current_index = combo.currentIndex()
-        combo.blockSignals(True)
-        
-        # Add a temporary empty item
-        combo.insertItem(0, "")
-        combo.setCurrentIndex(0)
-        
-        # Remove the temporary item
-        combo.removeItem(0)
-        
-        # Restore original state
-        combo.blockSignals(False)
+        # Combos share their models, so only the selection may be touched here
         combo.setCurrentIndex(-1)
+        if combo.isEditable():
+            combo.clearEditText()
 
     def clear_all_dropdowns(self):
         """Clear all dropdown selections reliably"""
@@ -900,7 +764,9 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "No Patient", "Please load or create a patient record first!")
             return
         
-        # Show print manager dialog
+        # Show print manager dialog. Report generation, printing and preview
+        # are only imported here, since most sessions never print.
+        from print_manager import PrintManager
         self.print_dialog = PrintManager(
             self.current_patient_id,
             self,
@@ -910,12 +776,27 @@ class MainWindow(QMainWindow):
         self.print_dialog.exec_()
 
     def showEvent(self, event):
-        """Auto-refresh dropdowns when window gains focus"""
-        self.load_dropdowns()
+        """Auto-refresh dropdowns when window gains focus.
+
+        Only categories whose revision changed since the last load are
+        refreshed; when nothing changed this costs at most one PRAGMA.
+        """
+        self.refresh_changed_dropdowns()
         super().showEvent(event)
 
+def shutdown_report_service():
+    # Nothing to stop unless a report was generated this session
+    report_service = sys.modules.get("report_service")
+    if report_service is not None:
+        report_service.shutdown_report_service()
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(shutdown_report_service)
+    app.aboutToQuit.connect(database.shutdown)
+    database.start_checkpointer()
     window = MainWindow()
     window.show()
+    if "--import-profile" in sys.argv:
+        import_profile.report("Imported at startup")
     sys.exit(app.exec_())
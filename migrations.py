@@ -0,0 +1,292 @@
+# migrations.py
+import sqlite3
+
+# Schema migrations. Each migration brings the database from version N-1 to
+# N; the version is stored in PRAGMA user_version. migrate() applies every
+# pending migration in one transaction, and does nothing but read
+# user_version when the database is already current.
+#
+# Never edit a released migration: add a new one to the end of MIGRATIONS.
+# The schema needs SQLite 3.24 (upsert, used by the dropdown revision
+# triggers); migrate() refuses to run on anything older.
+# Migrations 1-5 use IF NOT EXISTS because databases created before
+# versioning (user_version 0) may already contain some of their objects.
+
+
+def _table_columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+def _add_column(cursor, table, column, declaration):
+    if column not in _table_columns(cursor, table):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+
+def _base_schema(cursor):
+    table_creations = [
+        """CREATE TABLE IF NOT EXISTS dropdown_options (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category TEXT NOT NULL,
+            value TEXT NOT NULL,
+            UNIQUE(category, value)
+        );""",
+        """CREATE TABLE IF NOT EXISTS patients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            age INTEGER,
+            sex TEXT,
+            admission_date TEXT,
+            discharge_date TEXT,
+            bht_no TEXT UNIQUE,
+            indication TEXT,
+            history_exam TEXT,
+            management TEXT,
+            next_appointment TEXT
+        );""",
+        """CREATE TABLE IF NOT EXISTS operations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            surgeon TEXT,
+            anaesthetist TEXT,
+            anaesthesia_type TEXT,
+            surgery_name TEXT,
+            surgery_description TEXT,
+            FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE
+        );""",
+        """CREATE TABLE IF NOT EXISTS prescriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            drug_name TEXT,
+            drug_form TEXT,
+            strength TEXT,
+            dose TEXT,
+            frequency TEXT,
+            route TEXT,
+            duration TEXT,
+            FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE
+        );""",
+        """CREATE TABLE IF NOT EXISTS investigations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            value TEXT NOT NULL,
+            FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE
+        );""",
+        """CREATE TABLE IF NOT EXISTS op_variables (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            value TEXT NOT NULL,
+            FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE
+        );""",
+        """CREATE TABLE IF NOT EXISTS report_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            report_path TEXT NOT NULL,
+            printed_at TEXT NOT NULL,
+            FOREIGN KEY(patient_id) REFERENCES patients(id)
+        );"""
+    ]
+    for create_cmd in table_creations:
+        cursor.execute(create_cmd)
+
+def _patient_indexes(cursor):
+    # Per-patient lookups and ON DELETE CASCADE. dropdown_options(category,
+    # value) is already covered by the index behind its UNIQUE constraint.
+    index_creations = [
+        "CREATE INDEX IF NOT EXISTS idx_operations_patient_id ON operations(patient_id);",
+        "CREATE INDEX IF NOT EXISTS idx_prescriptions_patient_id ON prescriptions(patient_id);",
+        "CREATE INDEX IF NOT EXISTS idx_investigations_patient_id ON investigations(patient_id);",
+        "CREATE INDEX IF NOT EXISTS idx_op_variables_patient_id ON op_variables(patient_id);",
+        """CREATE INDEX IF NOT EXISTS idx_report_history_patient_printed
+            ON report_history(patient_id, printed_at);"""
+    ]
+    for create_cmd in index_creations:
+        cursor.execute(create_cmd)
+
+def _dropdown_revisions(cursor):
+    # Per-category revision stamps for dropdown options, bumped by triggers
+    # so changes from any process or tool are seen
+    revision_creations = [
+        """CREATE TABLE IF NOT EXISTS dropdown_revisions (
+            category TEXT PRIMARY KEY,
+            revision INTEGER NOT NULL
+        );""",
+        """CREATE TRIGGER IF NOT EXISTS dropdown_revision_insert AFTER INSERT ON dropdown_options BEGIN
+            INSERT INTO dropdown_revisions (category, revision) VALUES (new.category, 1)
+            ON CONFLICT(category) DO UPDATE SET revision = revision + 1;
+        END;""",
+        """CREATE TRIGGER IF NOT EXISTS dropdown_revision_update AFTER UPDATE ON dropdown_options BEGIN
+            INSERT INTO dropdown_revisions (category, revision) VALUES (old.category, 1)
+            ON CONFLICT(category) DO UPDATE SET revision = revision + 1;
+            INSERT INTO dropdown_revisions (category, revision) VALUES (new.category, 1)
+            ON CONFLICT(category) DO UPDATE SET revision = revision + 1;
+        END;""",
+        """CREATE TRIGGER IF NOT EXISTS dropdown_revision_delete AFTER DELETE ON dropdown_options BEGIN
+            INSERT INTO dropdown_revisions (category, revision) VALUES (old.category, 1)
+            ON CONFLICT(category) DO UPDATE SET revision = revision + 1;
+        END;"""
+    ]
+    for create_cmd in revision_creations:
+        cursor.execute(create_cmd)
+
+# First surgery of a patient, as stored in the search index
+_SEARCH_SURGERY = "(SELECT surgery_name FROM operations WHERE patient_id = {0} ORDER BY id LIMIT 1)"
+
+def _patient_search(cursor):
+    # Full-text patient search (FTS5): one row per patient (rowid =
+    # patients.id), kept in sync by triggers. Skipped on SQLite builds
+    # without FTS5; find_patients() then falls back to a LIKE scan.
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS patient_search USING fts5(
+                name, bht_no, indication, surgery_name,
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+        """)
+    except sqlite3.OperationalError:
+        return
+
+    trigger_creations = [
+        """CREATE TRIGGER IF NOT EXISTS patient_search_insert AFTER INSERT ON patients BEGIN
+            INSERT INTO patient_search (rowid, name, bht_no, indication, surgery_name)
+            VALUES (new.id, new.name, new.bht_no, new.indication, %s);
+        END;""" % _SEARCH_SURGERY.format("new.id"),
+        """CREATE TRIGGER IF NOT EXISTS patient_search_update
+            AFTER UPDATE OF name, bht_no, indication ON patients BEGIN
+            UPDATE patient_search SET name = new.name, bht_no = new.bht_no, indication = new.indication
+            WHERE rowid = new.id;
+        END;""",
+        """CREATE TRIGGER IF NOT EXISTS patient_search_delete AFTER DELETE ON patients BEGIN
+            DELETE FROM patient_search WHERE rowid = old.id;
+        END;""",
+        """CREATE TRIGGER IF NOT EXISTS patient_search_operation_insert AFTER INSERT ON operations BEGIN
+            UPDATE patient_search SET surgery_name = %s WHERE rowid = new.patient_id;
+        END;""" % _SEARCH_SURGERY.format("new.patient_id"),
+        """CREATE TRIGGER IF NOT EXISTS patient_search_operation_update
+            AFTER UPDATE OF surgery_name ON operations BEGIN
+            UPDATE patient_search SET surgery_name = %s WHERE rowid = new.patient_id;
+        END;""" % _SEARCH_SURGERY.format("new.patient_id"),
+        """CREATE TRIGGER IF NOT EXISTS patient_search_operation_delete AFTER DELETE ON operations BEGIN
+            UPDATE patient_search SET surgery_name = %s WHERE rowid = old.patient_id;
+        END;""" % _SEARCH_SURGERY.format("old.patient_id")
+    ]
+    for create_cmd in trigger_creations:
+        cursor.execute(create_cmd)
+
+    # (Re)build the index from the current patients
+    cursor.execute("DELETE FROM patient_search")
+    cursor.execute("""
+        INSERT INTO patient_search (rowid, name, bht_no, indication, surgery_name)
+        SELECT p.id, p.name, p.bht_no, p.indication, %s
+        FROM patients p
+    """ % _SEARCH_SURGERY.format("p.id"))
+
+def _report_content_hash(cursor):
+    _add_column(cursor, "report_history", "content_hash", "TEXT")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_report_history_patient_hash
+            ON report_history(patient_id, content_hash);
+    """)
+
+def _number_dropdown_options(cursor, order_by, first, step):
+    # Rank each category's options as first, first + step, ... in order_by
+    # order, in plain SQL (no window functions or UPDATE ... FROM). Rows are
+    # copied to a temporary table in sorted order, so its rowid numbers them;
+    # a position is then the row's number minus its category's first number.
+    # Positions are fixed before any option changes, and a correlated
+    # COUNT(*) per option would be quadratic in the size of a category.
+    cursor.execute("""
+        CREATE TEMP TABLE dropdown_positions (
+            seq INTEGER PRIMARY KEY, id INTEGER UNIQUE, category TEXT
+        )
+    """)
+    cursor.execute(f"""
+        INSERT INTO dropdown_positions (id, category)
+        SELECT id, category FROM dropdown_options ORDER BY category, {order_by}
+    """)
+    cursor.execute("CREATE INDEX temp.dropdown_positions_category ON dropdown_positions(category, seq)")
+    cursor.execute("""
+        UPDATE dropdown_options SET display_order = ? + ? * (
+            SELECT p.seq - (SELECT MIN(q.seq) FROM dropdown_positions AS q WHERE q.category = p.category)
+            FROM dropdown_positions AS p WHERE p.id = dropdown_options.id
+        )
+    """, (first, step))
+    cursor.execute("DROP TABLE dropdown_positions")
+
+def _dropdown_display_order(cursor):
+    # Number each category's options alphabetically (0, 1, 2, ...)
+    cursor.execute("ALTER TABLE dropdown_options ADD COLUMN display_order INTEGER")
+    _number_dropdown_options(cursor, "value", 0, 1)
+
+
+def _sparse_display_order(cursor):
+    # Spread ranks 1024 apart so an option can be moved by giving it a rank
+    # between its new neighbours, updating just that row. Unranked (NULL)
+    # options sort first.
+    _number_dropdown_options(cursor, "display_order, value", 1024, 1024)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_dropdown_options_category_order
+            ON dropdown_options(category, display_order, value);
+    """)
+
+
+def _dropdown_prefix_index(cursor):
+    # Case-insensitive prefix lookups for type-ahead on large categories
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_dropdown_options_category_value_nocase
+            ON dropdown_options(category, value COLLATE NOCASE);
+    """)
+
+
+# (version, description, function)
+MIGRATIONS = [
+    (1, "base schema", _base_schema),
+    (2, "per-patient indexes", _patient_indexes),
+    (3, "dropdown revision stamps", _dropdown_revisions),
+    (4, "full-text patient search", _patient_search),
+    (5, "report content hash", _report_content_hash),
+    (6, "dropdown display order", _dropdown_display_order),
+    (7, "sparse dropdown display order", _sparse_display_order),
+    (8, "case-insensitive dropdown prefix index", _dropdown_prefix_index),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+MIN_SQLITE_VERSION = (3, 24, 0)
+
+
+def schema_version(cursor):
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+def migrate(cursor):
+    """Apply pending migrations in one transaction; returns the versions applied.
+
+    The cursor's connection must not have other uncommitted work; the
+    caller commits (or rolls back everything on error).
+    """
+    if schema_version(cursor) == SCHEMA_VERSION:
+        return []
+    if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+        raise RuntimeError(
+            f"SQLite {sqlite3.sqlite_version} is too old; this program needs "
+            f"{'.'.join(map(str, MIN_SQLITE_VERSION))} or newer. Please update Python or SQLite."
+        )
+
+    # Take the write lock before re-reading the version, so two processes
+    # starting together cannot both apply the same migration
+    if not cursor.connection.in_transaction:
+        cursor.execute("BEGIN IMMEDIATE")
+    version = schema_version(cursor)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} is newer than this program "
+            f"supports ({SCHEMA_VERSION}). Please update the software."
+        )
+
+    applied = []
+    for number, _, apply in MIGRATIONS:
+        if number > version:
+            apply(cursor)
+            applied.append(number)
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return applied
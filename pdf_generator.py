@@ -1,7 +1,11 @@
+import hashlib
+import json
 import os
+import shutil
 import sys
-import pdfkit
-import jinja2
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import database
 from datetime import datetime
 
@@ -11,41 +15,73 @@ def resource_path(relative_path):
         return os.path.join(sys._MEIPASS, relative_path)
     return os.path.abspath(relative_path)
 
-def generate_patient_report(patient_id, output_path=None, hospital_name="", unit_name=""):
-    patient = database.get_patient(patient_id)
-    operation = database.get_patient_operation(patient_id)
-    prescriptions = database.get_patient_prescriptions(patient_id)
-    investigations = database.get_patient_investigations(patient_id)
-    
-    # Get operation variables for this patient
-    op_variables = database.get_op_variables(patient_id)
-    
-    # Helper: Date formatting
-    def format_date(date_str, format="%d/%m/%Y"):
-        if not date_str:
-            return ""
-        try:
-            dt = datetime.strptime(date_str, '%Y-%m-%d')
-            return dt.strftime(format)
-        except:
-            return date_str
-
-    def format_datetime(dt_str, format="%d/%m/%Y %H:%M"):
-        if not dt_str:
-            return ""
-        try:
-            dt = datetime.strptime(dt_str, '%Y-%m-%dT%H:%M:%S')
-            return dt.strftime(format)
-        except:
-            return dt_str
+# Date formatting helpers, also registered as template filters
+def format_date(date_str, format="%d/%m/%Y"):
+    if not date_str:
+        return ""
+    try:
+        dt = datetime.strptime(date_str, '%Y-%m-%d')
+        return dt.strftime(format)
+    except:
+        return date_str
+
+def format_datetime(dt_str, format="%d/%m/%Y %H:%M"):
+    if not dt_str:
+        return ""
+    try:
+        dt = datetime.strptime(dt_str, '%Y-%m-%dT%H:%M:%S')
+        return dt.strftime(format)
+    except:
+        return dt_str
+
+# Report templates. One Environment is shared by every report: templates are
+# compiled once, kept in memory, and recompiled only when the file's mtime
+# changes (auto_reload). Compiled bytecode is also stored on disk so a fresh
+# start skips parsing; Jinja2 picks a per-user folder only its owner can
+# write, since loading bytecode executes it. Macro files pulled in with
+# {% import %} are cached by the same Environment and shared across reports.
+TEMPLATE_DIR = "templates"
+REPORT_TEMPLATE = "report.html"
+
+_template_env = None
+_template_env_lock = threading.Lock()
+
+def get_template_env():
+    global _template_env
+    import jinja2
+    with _template_env_lock:
+        if _template_env is None:
+            env = jinja2.Environment(
+                loader=jinja2.FileSystemLoader(resource_path(TEMPLATE_DIR)),
+                bytecode_cache=jinja2.FileSystemBytecodeCache(),
+                auto_reload=True
+            )
+            env.filters['format_date'] = format_date
+            env.filters['format_datetime'] = format_datetime
+            env.globals['format_date'] = format_date
+            env.globals['format_datetime'] = format_datetime
+            _template_env = env
+        return _template_env
+
+def get_report_template(name=REPORT_TEMPLATE):
+    import jinja2
+    try:
+        return get_template_env().get_template(name)
+    except jinja2.TemplateNotFound:
+        template_path = resource_path(os.path.join(TEMPLATE_DIR, name))
+        raise FileNotFoundError(f"Template not found: {template_path}")
+
+def render_report_html(bundle, hospital_name="", unit_name=""):
+    """Render the report template for a PatientBundle"""
+    patient = bundle.patient
 
     # Context for Jinja2 template
     context = {
         'patient': patient,
-        'operation': operation,
-        'prescriptions': prescriptions,
-        'investigations': investigations,
-        'op_variables': op_variables,
+        'operation': bundle.operation,
+        'prescriptions': bundle.prescriptions,
+        'investigations': bundle.investigations,
+        'op_variables': bundle.op_variables,
         'admission_date': format_date(patient['admission_date']),
         'discharge_date': format_date(patient['discharge_date']),
         'next_appointment': format_datetime(patient['next_appointment']),
@@ -53,63 +89,311 @@ def generate_patient_report(patient_id, output_path=None, hospital_name="", unit
         'hospital_name': hospital_name,
         'unit_name': unit_name
     }
+    return get_report_template().render(context)
 
-    # Define output path
-    if output_path is None:
-        output_dir = "reports"
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(
-            output_dir,
-            f"patient_{patient_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+# Reports are archived here unless the caller asks for another place. Only
+# this folder is trimmed to REPORT_CACHE_MAX_BYTES, and only the files it
+# names itself (patient_*.pdf); PDFs saved anywhere else are never deleted.
+REPORTS_DIR = "reports"
+REPORT_FILE_PREFIX = "patient_"
+
+def report_output_path(patient_id, output_dir=None):
+    output_dir = output_dir or REPORTS_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(
+        output_dir,
+        f"{REPORT_FILE_PREFIX}{patient_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    )
+
+# PDF options for A5 landscape with optimized margins
+PDF_OPTIONS = {
+    'page-size': 'A5',
+    'orientation': 'Landscape',
+    'margin-top': '0.3in',
+    'margin-right': '0.3in',
+    'margin-bottom': '0.3in',
+    'margin-left': '0.3in',
+    'encoding': "UTF-8",
+    'disable-smart-shrinking': None,  # Ensures consistent scaling
+    'dpi': 300,  # Higher quality output
+    'print-media-type': None,  # Use print styles
+    'no-outline': None  # Disable table of contents
+}
+
+# PDF backends. Both turn rendered report HTML into a PDF file:
+#   "wkhtmltopdf" - the bundled/system wkhtmltopdf via pdfkit (one process per report)
+#   "qt"          - in-process QTextDocument + QPdfWriter, no process start-up
+#   "auto"        - wkhtmltopdf when it can be found, otherwise qt
+# Chosen with the SURGERY_PDF_BACKEND environment variable or set_pdf_backend().
+PDF_BACKEND = os.environ.get("SURGERY_PDF_BACKEND", "auto")
+
+class WkhtmltopdfBackend:
+    name = "wkhtmltopdf"
+
+    def __init__(self):
+        self._config = None
+        self._lock = threading.Lock()
+
+    def find_executable(self):
+        # Use wkhtmltopdf from bundled folder or system PATH
+        local_wkhtml = resource_path(os.path.join("wkhtmltopdf", "wkhtmltopdf.exe"))
+        if os.path.exists(local_wkhtml):
+            return local_wkhtml
+        return shutil.which("wkhtmltopdf")
+
+    def configuration(self):
+        """pdfkit configuration, resolved once and reused for every report"""
+        import pdfkit
+        with self._lock:
+            if self._config is None:
+                wkhtml_path = self.find_executable()
+                if not wkhtml_path:
+                    raise EnvironmentError("wkhtmltopdf not found. Please install or bundle it.")
+                self._config = pdfkit.configuration(wkhtmltopdf=wkhtml_path)
+            return self._config
+
+    def convert(self, html, output_path):
+        import pdfkit
+        # Generate PDF with landscape A5 settings
+        pdfkit.from_string(html, output_path, configuration=self.configuration(), options=PDF_OPTIONS)
+
+class QtPdfBackend:
+    """Renders with Qt's rich-text engine inside the running application.
+
+    Much faster to start than wkhtmltopdf, but only supports the HTML/CSS
+    subset QTextDocument understands. Needs a QGuiApplication; conversions
+    are serialised because QTextDocument is not safe to share across threads.
+    """
+    name = "qt"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def convert(self, html, output_path):
+        from PyQt5.QtCore import QMarginsF
+        from PyQt5.QtGui import QGuiApplication, QPageLayout, QPageSize, QPdfWriter, QTextDocument
+
+        if QGuiApplication.instance() is None:
+            raise RuntimeError("The Qt PDF backend needs a running QApplication.")
+
+        with self._lock:
+            writer = QPdfWriter(output_path)
+            writer.setResolution(int(PDF_OPTIONS['dpi']))
+            writer.setPageLayout(QPageLayout(
+                QPageSize(QPageSize.A5), QPageLayout.Landscape,
+                QMarginsF(0.3, 0.3, 0.3, 0.3), QPageLayout.Inch
+            ))
+            doc = QTextDocument()
+            doc.setHtml(html)
+            doc.print_(writer)
+
+PDF_BACKENDS = ("auto", "wkhtmltopdf", "qt")
+
+_backends = {}
+_backend_lock = threading.Lock()
+
+def _create_backend(name):
+    if name == "wkhtmltopdf":
+        return WkhtmltopdfBackend()
+    if name == "qt":
+        return QtPdfBackend()
+    if name == "auto":
+        wkhtml = WkhtmltopdfBackend()
+        return wkhtml if wkhtml.find_executable() else QtPdfBackend()
+    raise ValueError(f"Unknown PDF backend: {name}")
+
+def set_pdf_backend(name):
+    global PDF_BACKEND
+    if name not in PDF_BACKENDS:
+        raise ValueError(f"Unknown PDF backend: {name}")
+    PDF_BACKEND = name
+
+def get_pdf_backend(name=None):
+    """Backend instance for a name (default PDF_BACKEND), created once and reused"""
+    name = name or PDF_BACKEND
+    with _backend_lock:
+        if name not in _backends:
+            _backends[name] = _create_backend(name)
+        return _backends[name]
+
+def convert_html_to_pdf(html, output_path):
+    get_pdf_backend().convert(html, output_path)
+
+def record_report_history(entries):
+    """Add report_history rows for (patient_id, report_path, content_hash) in one transaction"""
+    printed_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with database.db_connection() as cursor:
+        cursor.executemany(
+            """INSERT INTO report_history (patient_id, report_path, printed_at, content_hash)
+               VALUES (?, ?, ?, ?)""",
+            [(patient_id, path, printed_at, content_hash) for patient_id, path, content_hash in entries]
         )
 
-    # Load the report.html template
-    template_path = resource_path(os.path.join("templates", "report.html"))
-    if not os.path.exists(template_path):
-        raise FileNotFoundError(f"Template not found: {template_path}")
+# Report cache. A report is identified by a hash of everything that goes into
+# it: the patient bundle, hospital/unit names, the template files and the PDF
+# settings. When a PDF with the same hash is still on disk it is reused
+# instead of converted again. The report date is left out of the hash, so a
+# reused PDF shows when it was first generated.
+REPORT_CACHE_MAX_BYTES = 500 * 1024 * 1024  # REPORTS_DIR is trimmed back to this size
+
+def template_version():
+    """Changes whenever a file in the template folder is edited, added or removed"""
+    template_dir = resource_path(TEMPLATE_DIR)
+    stamps = []
+    for root, _, files in os.walk(template_dir):
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            stamps.append((os.path.relpath(os.path.join(root, name), template_dir),
+                           stat.st_mtime_ns, stat.st_size))
+    return sorted(stamps)
 
-    with open(template_path, "r", encoding="utf-8") as f:
-        template_html = f.read()
-
-    template_env = jinja2.Environment(loader=jinja2.BaseLoader())
-    template = template_env.from_string(template_html)
-    html = template.render(context)
-
-    # Use wkhtmltopdf from bundled folder or system PATH
-    local_wkhtml = resource_path(os.path.join("wkhtmltopdf", "wkhtmltopdf.exe"))
-    if os.path.exists(local_wkhtml):
-        wkhtml_path = local_wkhtml
-    else:
-        import shutil
-        wkhtml_path = shutil.which("wkhtmltopdf")
-        if not wkhtml_path:
-            raise EnvironmentError("wkhtmltopdf not found. Please install or bundle it.")
-
-    # PDF options for A5 landscape with optimized margins
-    options = {
-        'page-size': 'A5',
-        'orientation': 'Landscape',
-        'margin-top': '0.3in',
-        'margin-right': '0.3in',
-        'margin-bottom': '0.3in',
-        'margin-left': '0.3in',
-        'encoding': "UTF-8",
-        'disable-smart-shrinking': None,  # Ensures consistent scaling
-        'dpi': 300,  # Higher quality output
-        'print-media-type': None,  # Use print styles
-        'no-outline': None  # Disable table of contents
+def report_content_hash(bundle, hospital_name="", unit_name=""):
+    content = {
+        'patient': dict(bundle.patient),
+        'operation': dict(bundle.operation) if bundle.operation else None,
+        'prescriptions': [dict(row) for row in bundle.prescriptions],
+        'investigations': [dict(row) for row in bundle.investigations],
+        'op_variables': [dict(row) for row in bundle.op_variables],
+        'hospital_name': hospital_name,
+        'unit_name': unit_name,
+        'template': template_version(),
+        'pdf': [get_pdf_backend().name, PDF_OPTIONS]
     }
-    
-    config = pdfkit.configuration(wkhtmltopdf=wkhtml_path)
-    
-    # Generate PDF with landscape A5 settings
-    pdfkit.from_string(html, output_path, configuration=config, options=options)
+    encoded = json.dumps(content, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
 
-    # Save to history
-    with database.db_connection() as cursor:
-        cursor.execute(
-            "INSERT INTO report_history (patient_id, report_path, printed_at) VALUES (?, ?, ?)",
-            (patient_id, output_path, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+def is_managed_report(path):
+    """True for a report file named and archived by this module in REPORTS_DIR"""
+    name = os.path.basename(path)
+    return (os.path.abspath(os.path.dirname(path)) == os.path.abspath(REPORTS_DIR)
+            and name.startswith(REPORT_FILE_PREFIX) and name.lower().endswith(".pdf"))
+
+def evict_reports(max_bytes=REPORT_CACHE_MAX_BYTES, keep=()):
+    """Delete the least recently used reports until REPORTS_DIR fits in max_bytes.
+
+    Only the patient_*.pdf files this module writes there are counted or
+    deleted. Their report_history rows are deleted too, so the print
+    history only lists reports that can still be opened.
+    """
+    if not max_bytes or not os.path.isdir(REPORTS_DIR):
+        return []
+    keep = {os.path.abspath(path) for path in keep}
+    files = []
+    for entry in os.scandir(REPORTS_DIR):
+        if entry.is_file() and is_managed_report(entry.path):
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in files)
+    removed = []
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue  # Open in a viewer; try again next time
+        total -= size
+        removed.append(path)
+    if removed:
+        database.delete_report_history(removed + [os.path.abspath(path) for path in removed])
+    return removed
+
+# html, where the PDF goes, its content hash, whether that PDF already exists,
+# and whether it is archived in REPORTS_DIR (and so subject to eviction)
+ReportJob = namedtuple(
+    'ReportJob', ['patient_id', 'html', 'output_path', 'content_hash', 'cached', 'managed'],
+    defaults=(False,)
+)
+
+def prepare_patient_report(patient_id, output_path=None, hospital_name="", unit_name="",
+                           output_dir=None):
+    """Load and render a report and look it up in the report cache.
+
+    When output_path is not given and an identical report is still on disk,
+    the returned job points at that PDF with cached=True and needs no
+    conversion.
+    """
+    bundle = database.load_patient_bundle(patient_id)
+    if bundle is None:
+        raise ValueError(f"Patient {patient_id} not found")
+
+    content_hash = report_content_hash(bundle, hospital_name, unit_name)
+    html = render_report_html(bundle, hospital_name, unit_name)
+
+    if output_path is None:
+        cached_path = database.find_cached_report(patient_id, content_hash)
+        if cached_path and os.path.exists(cached_path):
+            os.utime(cached_path)  # Mark as recently used for eviction
+            return ReportJob(patient_id, html, cached_path, content_hash, True,
+                             is_managed_report(cached_path))
+        output_path = report_output_path(patient_id, output_dir)
+        return ReportJob(patient_id, html, output_path, content_hash, False, is_managed_report(output_path))
+
+    # A path chosen by the caller belongs to them and is never evicted
+    return ReportJob(patient_id, html, output_path, content_hash, False, False)
+
+def finish_report(job):
+    """Record a newly converted report and keep the reports folder within its size limit"""
+    record_report_history([(job.patient_id, job.output_path, job.content_hash)])
+    if job.managed:
+        evict_reports(keep=[job.output_path])
+
+def generate_patient_report(patient_id, output_path=None, hospital_name="", unit_name=""):
+    job = prepare_patient_report(patient_id, output_path, hospital_name, unit_name)
+    if not job.cached:
+        convert_html_to_pdf(job.html, job.output_path)
+        finish_report(job)
+    return job.html, job.output_path
+
+def _generate_batch_item(patient_id, output_dir, hospital_name, unit_name):
+    try:
+        job = prepare_patient_report(
+            patient_id, hospital_name=hospital_name, unit_name=unit_name, output_dir=output_dir
         )
+        if not job.cached:
+            convert_html_to_pdf(job.html, job.output_path)
+        return job
+    finally:
+        database.release_connection()
+
+def generate_reports(patient_ids, output_dir=None, hospital_name="", unit_name="",
+                     progress=None, max_workers=None):
+    """Generate reports for many patients at once (e.g. end-of-day discharges).
+
+    Each worker loads, renders and converts one patient, so at most
+    max_workers (default: CPU count) wkhtmltopdf processes run at a time.
+    Unchanged reports are taken from the report cache.
+    progress(done, total, patient_id) is called from the calling thread as
+    each report finishes. All report_history rows are written in one
+    transaction at the end.
+
+    Returns (reports, errors): {patient_id: pdf_path} and {patient_id: exception}.
+    """
+    patient_ids = list(dict.fromkeys(patient_ids))
+    max_workers = max_workers or os.cpu_count() or 1
+    jobs = {}
+    errors = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_generate_batch_item, patient_id, output_dir, hospital_name, unit_name): patient_id
+            for patient_id in patient_ids
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            patient_id = futures[future]
+            try:
+                jobs[patient_id] = future.result()
+            except Exception as e:
+                errors[patient_id] = e
+            if progress:
+                progress(done, len(patient_ids), patient_id)
 
-    return html, output_path
+    new_jobs = [jobs[patient_id] for patient_id in patient_ids
+                if patient_id in jobs and not jobs[patient_id].cached]
+    record_report_history((job.patient_id, job.output_path, job.content_hash) for job in new_jobs)
+    if any(job.managed for job in new_jobs):
+        evict_reports(keep=[job.output_path for job in jobs.values()])
+    return {patient_id: job.output_path for patient_id, job in jobs.items()}, errors
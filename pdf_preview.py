@@ -0,0 +1,230 @@
+# pdf_preview.py
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QLabel, QPushButton, QScrollArea, QWidget, QTextBrowser
+)
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+import pdf_raster
+
+PREVIEW_PAGES = 2           # Only the first pages are rendered
+PREVIEW_DPI = 110           # Readable on screen, quick to rasterise
+MEMORY_CACHE_SIZE = 24      # Rendered pages kept in memory
+PREVIEW_CACHE_DIR = os.path.join(tempfile.gettempdir(), "surgery_report_previews")
+PREVIEW_CACHE_MAX_BYTES = 50 * 1024 * 1024  # PNG folder is trimmed back to this size
+
+# Rendered pages are cached by (path, mtime, size, page), so a regenerated
+# PDF is never shown from a stale image. Recently shown pages stay in memory;
+# every rendered page is also written as a PNG so previews stay fast after
+# a restart. The least recently shown PNGs are deleted once the folder grows
+# past PREVIEW_CACHE_MAX_BYTES. Each PDF's page count is cached the same way,
+# so pages past the end of a short report are known not to exist.
+_memory_cache = OrderedDict()
+_page_counts = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _document_key(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+def _cache_key(path, page_number):
+    return _document_key(path) + (page_number, PREVIEW_DPI)
+
+def _disk_cache_path(key, extension=".png"):
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(PREVIEW_CACHE_DIR, digest + extension)
+
+def _remember(key, image):
+    with _cache_lock:
+        _memory_cache[key] = image
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+def cached_page(path, page_number):
+    """A previously rendered page from memory or disk, or None"""
+    key = _cache_key(path, page_number)
+    with _cache_lock:
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            return _memory_cache[key]
+    png_path = _disk_cache_path(key)
+    image = QImage(png_path)
+    if image.isNull():
+        return None
+    try:
+        os.utime(png_path)  # Mark as recently used for trimming
+    except OSError:
+        pass
+    _remember(key, image)
+    return image
+
+def _remember_page_count(key, count):
+    with _cache_lock:
+        _page_counts[key] = count
+        _page_counts.move_to_end(key)
+        while len(_page_counts) > MEMORY_CACHE_SIZE:
+            _page_counts.popitem(last=False)
+
+def cached_page_count(path):
+    """Number of pages of a previously rendered PDF, or None"""
+    key = _document_key(path)
+    with _cache_lock:
+        if key in _page_counts:
+            _page_counts.move_to_end(key)
+            return _page_counts[key]
+    try:
+        with open(_disk_cache_path(key, ".pages"), encoding="ascii") as f:
+            count = int(f.read())
+    except (OSError, ValueError):
+        return None
+    _remember_page_count(key, count)
+    return count
+
+def render_preview_pages(path, page_numbers):
+    """Render pages missing from the caches and store them in both"""
+    page_count, images = pdf_raster.render_pages(path, page_numbers, PREVIEW_DPI)
+    os.makedirs(PREVIEW_CACHE_DIR, exist_ok=True)
+    key = _document_key(path)
+    _remember_page_count(key, page_count)
+    with open(_disk_cache_path(key, ".pages"), "w", encoding="ascii") as f:
+        f.write(str(page_count))
+    for page_number, image in images:
+        key = _cache_key(path, page_number)
+        _remember(key, image)
+        image.save(_disk_cache_path(key), "PNG")
+    trim_disk_cache()
+    return images
+
+def trim_disk_cache(max_bytes=PREVIEW_CACHE_MAX_BYTES):
+    """Delete the least recently used files until the cache folder fits in max_bytes"""
+    if not os.path.isdir(PREVIEW_CACHE_DIR):
+        return
+    files = []
+    for entry in os.scandir(PREVIEW_CACHE_DIR):
+        if entry.is_file() and entry.name.endswith((".png", ".pages")):
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+class _PreviewSignals(QObject):
+    page_ready = pyqtSignal(int, QImage)
+    failed = pyqtSignal(str)
+
+
+class _RenderTask(QRunnable):
+    def __init__(self, path, page_numbers):
+        super().__init__()
+        self.path = path
+        self.page_numbers = page_numbers
+        self.signals = _PreviewSignals()
+
+    def run(self):
+        try:
+            for page_number, image in render_preview_pages(self.path, self.page_numbers):
+                self.signals.page_ready.emit(page_number, image)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+
+
+class ReportPreviewDialog(QDialog):
+    """Shows the first pages of a report PDF as images.
+
+    Cached pages are shown immediately; the rest are rendered on a pool
+    thread. Without PyMuPDF the report HTML is shown when available,
+    otherwise only the Open button is offered.
+    """
+    open_requested = pyqtSignal(str)
+
+    def __init__(self, report_path, html_content=None, parent=None):
+        super().__init__(parent)
+        self.report_path = report_path
+        self.setWindowTitle("Report Preview")
+        self.setGeometry(100, 100, 800, 600)
+        layout = QVBoxLayout(self)
+
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._page_labels = {}
+
+        report_exists = os.path.exists(report_path)
+        if not report_exists:
+            layout.addWidget(QLabel(f"This report is no longer available:\n{report_path}"))
+        elif pdf_raster.RASTER_AVAILABLE:
+            layout.addWidget(self._build_page_view())
+        elif html_content:
+            text_browser = QTextBrowser()
+            text_browser.setHtml(html_content)
+            layout.addWidget(text_browser)
+        else:
+            layout.addWidget(QLabel(
+                f"PDF preview requires PyMuPDF (pip install pymupdf).\nPDF saved at: {report_path}"
+            ))
+
+        open_btn = QPushButton("Open in Default Viewer")
+        open_btn.clicked.connect(lambda: self.open_requested.emit(self.report_path))
+        open_btn.setEnabled(report_exists)
+        layout.addWidget(open_btn)
+
+        close_btn = QPushButton("Close Preview")
+        close_btn.clicked.connect(self.accept)
+        layout.addWidget(close_btn)
+
+    def _build_page_view(self):
+        pages = QWidget()
+        pages_layout = QVBoxLayout(pages)
+        pages_layout.setAlignment(Qt.AlignHCenter)
+
+        # Pages past the end of a report previewed before are not looked for
+        page_count = cached_page_count(self.report_path)
+        shown = PREVIEW_PAGES if page_count is None else min(PREVIEW_PAGES, max(page_count, 1))
+        missing = []
+        for page_number in range(shown):
+            label = QLabel("Rendering page..." if page_number == 0 else "")
+            label.setAlignment(Qt.AlignCenter)
+            pages_layout.addWidget(label)
+            self._page_labels[page_number] = label
+            image = cached_page(self.report_path, page_number)
+            if image is not None:
+                self.show_page(page_number, image)
+            else:
+                missing.append(page_number)
+
+        if missing:
+            task = _RenderTask(self.report_path, missing)
+            task.signals.page_ready.connect(self.show_page)
+            task.signals.failed.connect(self.show_error)
+            self._pool.start(task)
+
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(pages)
+        return scroll
+
+    def show_page(self, page_number, image):
+        label = self._page_labels.get(page_number)
+        if label is not None:
+            label.setPixmap(QPixmap.fromImage(image))
+
+    def show_error(self, message):
+        self._page_labels[0].setText(f"Could not render preview: {message}")
+
+    def done(self, result):
+        self._pool.clear()
+        self._pool.waitForDone()
+        super().done(result)
@@ -0,0 +1,88 @@
+# pdf_raster.py
+import os
+import shutil
+import subprocess
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QImage, QPainter
+
+# PyMuPDF is optional. Without it PDFs are handed to the operating system's
+# print spooler instead of being rasterised through QPrinter.
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf  # PyMuPDF before 1.24
+    except ImportError:
+        pymupdf = None
+
+RASTER_AVAILABLE = pymupdf is not None
+MAX_PRINT_DPI = 300     # Higher printer resolutions add size, not visible quality
+
+
+def render_page(path, page_number=0, dpi=150):
+    """Rasterise one page of a PDF into a QImage"""
+    if not RASTER_AVAILABLE:
+        raise RuntimeError("Rendering PDF pages requires PyMuPDF (pip install pymupdf).")
+    with pymupdf.open(path) as doc:
+        return _page_image(doc[page_number], dpi)
+
+def render_pages(path, page_numbers, dpi=150):
+    """Rasterise several pages with one open of the file.
+
+    Returns (page_count, [(page_number, image), ...]); pages past the end
+    are skipped.
+    """
+    if not RASTER_AVAILABLE:
+        raise RuntimeError("Rendering PDF pages requires PyMuPDF (pip install pymupdf).")
+    with pymupdf.open(path) as doc:
+        return doc.page_count, [(number, _page_image(doc[number], dpi))
+                                for number in page_numbers if number < doc.page_count]
+
+def _page_image(page, dpi):
+    pixmap = page.get_pixmap(dpi=dpi, alpha=False)
+    image = QImage(pixmap.samples, pixmap.width, pixmap.height, pixmap.stride, QImage.Format_RGB888)
+    return image.copy()  # Detach from PyMuPDF's buffer before it is freed
+
+def print_pdf(path, printer):
+    """Print a PDF on a configured QPrinter, one raster image per page.
+
+    Honours the page range chosen in the print dialog; copies and duplex
+    are left to the printer.
+    """
+    if not RASTER_AVAILABLE:
+        raise RuntimeError("Printing PDFs through Qt requires PyMuPDF (pip install pymupdf).")
+    dpi = min(printer.resolution(), MAX_PRINT_DPI)
+
+    with pymupdf.open(path) as doc:
+        first, last = 0, doc.page_count - 1
+        if printer.fromPage() > 0:
+            first = printer.fromPage() - 1
+            last = min(printer.toPage() - 1, last)
+
+        painter = QPainter()
+        if not painter.begin(printer):
+            raise RuntimeError("Could not start printing.")
+        try:
+            for page_number in range(first, last + 1):
+                if page_number > first:
+                    printer.newPage()
+                image = _page_image(doc[page_number], dpi)
+                # Fit the page into the printable area, keeping its proportions
+                target = QRectF(painter.viewport())
+                scale = min(target.width() / image.width(), target.height() / image.height())
+                painter.drawImage(
+                    QRectF(target.x(), target.y(), image.width() * scale, image.height() * scale),
+                    image
+                )
+        finally:
+            painter.end()
+
+def send_to_system_printer(path):
+    """Pass a PDF unchanged to the default printer via the operating system"""
+    if os.name == 'nt':
+        os.startfile(path, "print")
+        return
+    lp = shutil.which("lp") or shutil.which("lpr")
+    if not lp:
+        raise RuntimeError("No print command (lp/lpr) found. Please open and print manually.")
+    subprocess.run([lp, path], check=True, capture_output=True)
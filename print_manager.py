@@ -1,12 +1,13 @@
 # print_manager.py
 from PyQt5.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QListWidget, 
-    QLabel, QListWidgetItem, QMessageBox, QTextBrowser
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QListView,
+    QLabel, QMessageBox, QProgressDialog
+)
+from PyQt5.QtCore import (
+    Qt, QObject, QRunnable, QThreadPool, QAbstractListModel, QModelIndex, pyqtSignal
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtPrintSupport import QPrintDialog, QPrinter
-from PyQt5.QtGui import QTextDocument
 import database
+from report_service import report_service
 import os
 import subprocess
 import sys
@@ -14,6 +15,101 @@ import sqlite3
 import datetime
 import tempfile
 
+# Print through QTextDocument from the report HTML instead of printing the
+# generated PDF. The HTML engine lays the page out differently from the PDF.
+PRINT_FROM_HTML = False
+
+HISTORY_PAGE_SIZE = 50  # History rows fetched each time the list scrolls to the end
+
+
+class PrintHistoryModel(QAbstractListModel):
+    """A patient's report history, read from the database a page at a time"""
+
+    def __init__(self, patient_id, parent=None):
+        super().__init__(parent)
+        self.patient_id = patient_id
+        self._rows = []
+        self._exhausted = True
+
+    def reload(self):
+        self.beginResetModel()
+        self._rows = []
+        self._exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        after = (self._rows[-1]['printed_at'], self._rows[-1]['id']) if self._rows else None
+        rows = database.get_print_history_page(self.patient_id, HISTORY_PAGE_SIZE, after)
+        self._exhausted = len(rows) < HISTORY_PAGE_SIZE
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(rows) - 1)
+            self._rows.extend(rows)
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{self._format_printed_at(row['printed_at'])} - {row['report_path']}"
+        if role == Qt.UserRole:
+            return row['report_path']
+        return None
+
+    @staticmethod
+    def _format_printed_at(printed_at):
+        try:
+            return datetime.datetime.strptime(
+                printed_at, '%Y-%m-%d %H:%M:%S'
+            ).strftime('%d/%m/%Y %H:%M')
+        except (TypeError, ValueError):
+            return printed_at
+
+
+class _PrepareSignals(QObject):
+    prepared = pyqtSignal(int, object)  # request, pdf_generator.ReportJob
+    failed = pyqtSignal(int, str)
+
+
+class _PrepareReportTask(QRunnable):
+    """Loads and renders a report on a pool thread"""
+
+    def __init__(self, request, patient_id, hospital_name, unit_name, is_current):
+        super().__init__()
+        self.request = request
+        self.patient_id = patient_id
+        self.hospital_name = hospital_name
+        self.unit_name = unit_name
+        self.is_current = is_current
+        self.signals = _PrepareSignals()
+
+    def run(self):
+        if not self.is_current(self.request):
+            return  # Cancelled before it started
+        try:
+            from pdf_generator import prepare_patient_report
+            report = prepare_patient_report(
+                self.patient_id,
+                hospital_name=self.hospital_name,
+                unit_name=self.unit_name
+            )
+        except Exception as e:
+            self.signals.failed.emit(self.request, str(e))
+        else:
+            self.signals.prepared.emit(self.request, report)
+        finally:
+            database.release_connection()
+
+
 class PrintManager(QDialog):
     def __init__(self, patient_id, parent=None, hospital_name="", unit_name=""):
         super().__init__(parent)
@@ -26,10 +122,27 @@ class PrintManager(QDialog):
         layout = QVBoxLayout(self)
 
         layout.addWidget(QLabel("Print History:"))
-        self.history_list = QListWidget()
+        self.history_model = PrintHistoryModel(patient_id, self)
+        self.history_list = QListView()
+        self.history_list.setModel(self.history_model)
+        self.history_list.setUniformItemSizes(True)
         layout.addWidget(self.history_list)
         self.load_history()
 
+        # Reports are loaded and rendered on self._pool, then converted by the
+        # shared report service. One report runs at a time; _request is bumped
+        # on cancel so late results are ignored.
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._request = 0
+        self._action = None
+        self._html = None
+        self._job_id = None
+        self._progress = None
+        report_service().finished.connect(self.report_finished)
+        report_service().failed.connect(self.report_failed)
+        self._service_connected = True
+
         btn_layout = QHBoxLayout()
 
         self.print_btn = QPushButton("Print Now")
@@ -51,19 +164,8 @@ class PrintManager(QDialog):
         layout.addLayout(btn_layout)
 
     def load_history(self):
-        self.history_list.clear()
         try:
-            history = database.get_print_history(self.patient_id)
-            for item in history:
-                try:
-                    printed_at = datetime.datetime.strptime(
-                        item['printed_at'], '%Y-%m-%d %H:%M:%S'
-                    ).strftime('%d/%m/%Y %H:%M')
-                except:
-                    printed_at = item['printed_at']
-                list_item = QListWidgetItem(f"{printed_at} - {item['report_path']}")
-                list_item.setData(Qt.UserRole, item)
-                self.history_list.addItem(list_item)
+            self.history_model.reload()
         except sqlite3.OperationalError as e:
             if "no such table" in str(e):
                 QMessageBox.warning(self, "Missing Table", 
@@ -73,99 +175,157 @@ class PrintManager(QDialog):
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Unexpected error: {str(e)}")
 
+    def selected_report_path(self):
+        index = self.history_list.currentIndex()
+        if not index.isValid() or not self.history_list.selectionModel().isSelected(index):
+            return None
+        return index.data(Qt.UserRole)
+
+    def _is_current(self, request):
+        return request == self._request
+
+    def _start_report(self, action):
+        """Generate the report in the background; action runs when the PDF is ready"""
+        self._request += 1
+        self._action = action
+        self._set_busy(True)
+
+        self._progress = QProgressDialog("Loading patient record...", "Cancel", 0, 2, self)
+        self._progress.setWindowTitle("Print" if action == "print" else "Preview")
+        self._progress.setWindowModality(Qt.WindowModal)
+        self._progress.setMinimumDuration(300)  # Cached reports finish before it shows
+        self._progress.setAutoClose(False)
+        self._progress.setAutoReset(False)
+        self._progress.canceled.connect(self.cancel_report)
+        self._progress.setValue(0)
+
+        task = _PrepareReportTask(
+            self._request, self.patient_id, self.hospital_name, self.unit_name, self._is_current
+        )
+        task.signals.prepared.connect(self.report_prepared)
+        task.signals.failed.connect(self.report_prepare_failed)
+        self._pool.start(task)
+
+    def _set_busy(self, busy):
+        self.print_btn.setEnabled(not busy)
+        self.preview_btn.setEnabled(not busy)
+
+    def _end_report(self):
+        self._job_id = None
+        self._html = None
+        self._set_busy(False)
+        if self._progress is not None:
+            self._progress.canceled.disconnect(self.cancel_report)
+            self._progress.close()
+            self._progress.deleteLater()
+            self._progress = None
+
+    def cancel_report(self):
+        # A conversion that has already started still finishes and is kept
+        # in the history; its result is just not shown
+        self._request += 1
+        self._pool.clear()
+        if self._job_id is not None:
+            report_service().cancel(self._job_id)
+        self._end_report()
+
     def print_directly(self):
-        try:
-            from pdf_generator import generate_patient_report
-            html, path = generate_patient_report(
-                self.patient_id,
-                hospital_name=self.hospital_name,
-                unit_name=self.unit_name
-            )
-            self.print_html(html)
-            self.load_history()
-            QMessageBox.information(self, "Success", "Printed successfully!")
-        except Exception as e:
-            QMessageBox.critical(self, "Print Error", f"Failed to print: {str(e)}")
+        self._start_report("print")
 
     def show_preview(self):
         try:
-            selected = self.history_list.selectedItems()
-            if selected:
-                report_path = selected[0].data(Qt.UserRole)['report_path']
+            report_path = self.selected_report_path()
+            if report_path:
                 self._show_preview_dialog(report_path)
             else:
-                from pdf_generator import generate_patient_report
-                html, path = generate_patient_report(
-                    self.patient_id,
-                    hospital_name=self.hospital_name,
-                    unit_name=self.unit_name
-                )
-                self._show_preview_dialog(path, html)
-                self.load_history()
+                self._start_report("preview")
         except Exception as e:
             QMessageBox.critical(self, "Preview Error", f"Failed to preview: {str(e)}")
 
-    def _show_preview_dialog(self, report_path, html_content=None):
-        preview_dialog = QDialog(self)
-        preview_dialog.setWindowTitle("Report Preview")
-        preview_dialog.setGeometry(100, 100, 800, 600)
-        layout = QVBoxLayout(preview_dialog)
+    def _error_title(self):
+        return "Print Error" if self._action == "print" else "Preview Error"
 
-        try:
-            from PyQt5.QtWebEngineWidgets import QWebEngineView
-            from PyQt5.QtCore import QUrl
-            web_view = QWebEngineView()
-            abs_path = os.path.abspath(report_path).replace('\\', '/')
-            web_view.load(QUrl(f"file:///{abs_path}"))
-            layout.addWidget(web_view)
-        except ImportError:
-            if html_content:
-                text_browser = QTextBrowser()
-                text_browser.setHtml(html_content)
-                layout.addWidget(text_browser)
-            else:
-                try:
-                    import pdfminer.high_level
-                    from io import StringIO
-                    output_string = StringIO()
-                    pdfminer.high_level.extract_text_to_fp(
-                        open(report_path, 'rb'), output_string
-                    )
-                    text_browser = QTextBrowser()
-                    text_browser.setPlainText(output_string.getvalue())
-                    layout.addWidget(text_browser)
-                except ImportError:
-                    layout.addWidget(QLabel(
-                        f"PDF preview requires PyQtWebEngine or pdfminer.six.\nPDF saved at: {report_path}"
-                    ))
-
-        open_btn = QPushButton("Open in Default Viewer")
-        open_btn.clicked.connect(lambda: self.open_pdf(report_path))
-        layout.addWidget(open_btn)
-
-        close_btn = QPushButton("Close Preview")
-        close_btn.clicked.connect(preview_dialog.accept)
-        layout.addWidget(close_btn)
+    def report_prepared(self, request, report):
+        if not self._is_current(request):
+            return
+        self._html = report.html
+        self._job_id = report_service().submit(report)
+        if self._progress is not None:
+            self._progress.setLabelText("Generating PDF...")
+            self._progress.setValue(1)
+
+    def report_prepare_failed(self, request, message):
+        if not self._is_current(request):
+            return
+        self._end_report()
+        QMessageBox.critical(self, self._error_title(), f"Failed to prepare report: {message}")
+
+    def report_finished(self, job_id, path):
+        if job_id != self._job_id:
+            return  # Cancelled, or submitted by another dialog
+        html = self._html
+        self._end_report()
+        self.load_history()
+        if self._action == "print":
+            printed = self.print_html(html) if PRINT_FROM_HTML else self.print_pdf(path)
+            if printed:
+                QMessageBox.information(self, "Success", "Printed successfully!")
+        else:
+            self._show_preview_dialog(path, html)
 
+    def report_failed(self, job_id, message):
+        if job_id != self._job_id:
+            return
+        self._end_report()
+        QMessageBox.critical(self, self._error_title(), f"Failed to generate PDF: {message}")
+
+    def done(self, result):
+        if self._progress is not None:
+            self.cancel_report()
+        self._pool.clear()
+        self._pool.waitForDone()
+        if self._service_connected:
+            report_service().finished.disconnect(self.report_finished)
+            report_service().failed.disconnect(self.report_failed)
+            self._service_connected = False
+        super().done(result)
+
+    def _show_preview_dialog(self, report_path, html_content=None):
+        from pdf_preview import ReportPreviewDialog
+        preview_dialog = ReportPreviewDialog(report_path, html_content, self)
+        preview_dialog.open_requested.connect(self.open_pdf)
         preview_dialog.exec_()
 
     def print_pdf(self, path):
-        if os.name == 'nt':
-            try:
-                os.startfile(path, "print")
-            except Exception as e:
-                QMessageBox.warning(self, "Print Error", 
-                    f"Failed to print: {str(e)}\nPlease open and print manually.")
-        else:
-            QMessageBox.warning(self, "Print", 
-                "Direct printing only supported on Windows. Please open and print manually.")
+        """Print the generated PDF itself, so the paper copy matches the archived file.
+
+        Rasterised through QPrinter when PyMuPDF is installed, otherwise sent
+        to the system print spooler. Returns False if the user cancelled.
+        """
+        import pdf_raster
+        from PyQt5.QtPrintSupport import QPrintDialog, QPrinter
+        try:
+            if not pdf_raster.RASTER_AVAILABLE:
+                pdf_raster.send_to_system_printer(path)
+                return True
+            printer = QPrinter(QPrinter.HighResolution)
+            printer.setPageSize(QPrinter.A5)
+            printer.setOrientation(QPrinter.Landscape)
+            dialog = QPrintDialog(printer, self)
+            if dialog.exec_() != QPrintDialog.Accepted:
+                return False
+            pdf_raster.print_pdf(path, printer)
+            return True
+        except Exception as e:
+            QMessageBox.warning(self, "Print Error", 
+                f"Failed to print: {str(e)}\nPlease open and print manually.")
+            return False
 
     def open_pdf(self, path=None):
         if not path:
-            selected = self.history_list.selectedItems()
-            if not selected:
+            path = self.selected_report_path()
+            if not path:
                 return
-            path = selected[0].data(Qt.UserRole)['report_path']
 
         try:
             os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -180,6 +340,8 @@ class PrintManager(QDialog):
                 f"Failed to open PDF: {str(e)}\nPath: {path}")
 
     def print_html(self, html_content):
+        from PyQt5.QtGui import QTextDocument
+        from PyQt5.QtPrintSupport import QPrintDialog, QPrinter
         printer = QPrinter(QPrinter.HighResolution)
         dialog = QPrintDialog(printer, self)
 
@@ -187,6 +349,8 @@ class PrintManager(QDialog):
             doc = QTextDocument()
             doc.setHtml(html_content)
             doc.print_(printer)
+            return True
+        return False
 
 if __name__ == "__main__":
     from PyQt5.QtWidgets import QApplication
@@ -1,26 +1,21 @@
 # repair_db.py
-import sqlite3
-import os
+import database
+import migrations
 
-DB_PATH = "urology_data.db"
-
-def create_report_history_table():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS report_history (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        patient_id INTEGER NOT NULL,
-        report_path TEXT NOT NULL,
-        printed_at TEXT NOT NULL,
-        FOREIGN KEY(patient_id) REFERENCES patients(id)
-    );
-    """)
-    
-    conn.commit()
-    conn.close()
-    print("report_history table created!")
+def repair_database():
+    """Apply any schema migrations the database is missing"""
+    print("Repairing database...")
+    # Opening the database (importing database) already applied whatever
+    # was pending; migrate() again in case it was changed since
+    applied = database.MIGRATIONS_APPLIED + database.migrate()
+    if applied:
+        print(f"Schema upgraded from version {applied[0] - 1} to {migrations.SCHEMA_VERSION}:")
+        for number, description, _ in migrations.MIGRATIONS:
+            if number in applied:
+                print(f"  {number}: {description}")
+    else:
+        print(f"Schema is up to date (version {migrations.SCHEMA_VERSION}).")
+    print("Database repair complete!")
 
 if __name__ == "__main__":
-    create_report_history_table()
+    repair_database()
@@ -0,0 +1,213 @@
+# report_service.py
+import itertools
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+import database
+import pdf_generator
+
+REPORT_WORKERS = 2          # Conversions running at the same time
+CONVERT_TIMEOUT = 60        # Seconds a warm wkhtmltopdf may take for one report
+
+
+def _wkhtmltopdf_args(source_path, output_path):
+    """One --read-args-from-stdin line for converting source_path to output_path"""
+    args = []
+    for key, value in pdf_generator.PDF_OPTIONS.items():
+        args.append(f"--{key}")
+        if value is not None:
+            args.append(str(value))
+    # wkhtmltopdf splits the line itself; quote paths and use forward slashes
+    for path in (source_path, output_path):
+        args.append('"' + os.path.abspath(path).replace('\\', '/') + '"')
+    return " ".join(args) + "\n"
+
+
+class WarmWkhtmltopdf:
+    """A wkhtmltopdf process kept running between reports.
+
+    Started with --read-args-from-stdin, it converts one report per line it
+    is sent, so the process start-up and Qt/WebKit initialisation are paid
+    once instead of for every report. Completion is read from its stderr
+    progress output. If the process dies or hangs it is killed, and the
+    next report starts a fresh one.
+    """
+
+    def __init__(self, executable):
+        self.executable = executable
+        self._process = None
+        self._lines = None
+
+    def _start(self):
+        self._process = subprocess.Popen(
+            [self.executable, "--read-args-from-stdin"],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            text=True, bufsize=1
+        )
+        self._lines = queue.Queue()
+        threading.Thread(
+            target=self._read_stderr, args=(self._process.stderr, self._lines), daemon=True
+        ).start()
+
+    @staticmethod
+    def _read_stderr(stream, lines):
+        # Progress bars are redrawn with '\r'; split on both so "Done" is seen promptly
+        buffer = ""
+        for char in iter(lambda: stream.read(1), ""):
+            if char in "\r\n":
+                if buffer.strip():
+                    lines.put(buffer.strip())
+                buffer = ""
+            else:
+                buffer += char
+        lines.put(None)  # Process exited
+
+    def convert(self, html, output_path):
+        if self._process is None or self._process.poll() is not None:
+            self._start()
+
+        fd, source_path = tempfile.mkstemp(suffix=".html")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(html)
+            self._process.stdin.write(_wkhtmltopdf_args(source_path, output_path))
+            self._process.stdin.flush()
+            self._wait_until_done()
+        except Exception:
+            self.close()
+            raise
+        finally:
+            os.remove(source_path)
+
+        if not os.path.exists(output_path):
+            raise RuntimeError(f"wkhtmltopdf did not write {output_path}")
+
+    def _wait_until_done(self):
+        errors = []
+        while True:
+            try:
+                line = self._lines.get(timeout=CONVERT_TIMEOUT)
+            except queue.Empty:
+                raise TimeoutError("wkhtmltopdf did not finish in time")
+            if line is None:
+                raise RuntimeError("wkhtmltopdf exited: " + "; ".join(errors[-3:]))
+            if line == "Done":
+                return
+            if line.startswith("Error") or line.startswith("Exit with code"):
+                errors.append(line)
+
+    def close(self):
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=5)
+            except Exception:
+                self._process.kill()
+            self._process = None
+
+
+class ReportService(QObject):
+    """Converts reports to PDF on background threads.
+
+    submit() takes a pdf_generator.ReportJob and returns at once with a job
+    id; finished(job_id, pdf_path) or failed(job_id, message) is emitted when
+    the job is done, delivered on the GUI thread. Newly converted reports are
+    added to report_history by the worker; cached ones are passed straight
+    through. With the wkhtmltopdf backend every worker keeps its own
+    warm process; other backends are called directly.
+    """
+    finished = pyqtSignal(int, str)
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, workers=REPORT_WORKERS, parent=None):
+        super().__init__(parent)
+        self._jobs = queue.Queue()
+        self._job_ids = itertools.count(1)
+        self._queued = set()        # Submitted, not yet taken by a worker
+        self._cancelled = set()     # Always a subset of _queued
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"report-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, report):
+        job_id = next(self._job_ids)
+        with self._lock:
+            self._queued.add(job_id)
+        self._jobs.put((job_id, report))
+        return job_id
+
+    def cancel(self, job_id):
+        """Skip a job that has not started yet; returns False if it already has"""
+        with self._lock:
+            if job_id not in self._queued:
+                return False
+            self._cancelled.add(job_id)
+            return True
+
+    def shutdown(self, timeout=10):
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self):
+        warm = None
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                job_id, report = job
+                with self._lock:
+                    self._queued.discard(job_id)
+                    if job_id in self._cancelled:
+                        self._cancelled.discard(job_id)
+                        continue
+
+                try:
+                    if report.cached:
+                        self.finished.emit(job_id, report.output_path)
+                        continue
+                    backend = pdf_generator.get_pdf_backend()
+                    if isinstance(backend, pdf_generator.WkhtmltopdfBackend):
+                        if warm is None:
+                            executable = backend.find_executable()
+                            if not executable:
+                                raise EnvironmentError("wkhtmltopdf not found. Please install or bundle it.")
+                            warm = WarmWkhtmltopdf(executable)
+                        warm.convert(report.html, report.output_path)
+                    else:
+                        backend.convert(report.html, report.output_path)
+                    pdf_generator.finish_report(report)
+                except Exception as e:
+                    self.failed.emit(job_id, str(e))
+                else:
+                    self.finished.emit(job_id, report.output_path)
+                finally:
+                    database.release_connection()
+        finally:
+            if warm is not None:
+                warm.close()
+
+
+_service = None
+
+def report_service():
+    """The application's shared ReportService, started on first use"""
+    global _service
+    if _service is None:
+        _service = ReportService()
+    return _service
+
+def shutdown_report_service():
+    global _service
+    if _service is not None:
+        _service.shutdown()
+        _service = None
@@ -0,0 +1,189 @@
+# search_dialog.py
+from collections import OrderedDict
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QLabel, QLineEdit, QListView, QDialogButtonBox, QMessageBox
+)
+from PyQt5.QtCore import (
+    Qt, QObject, QRunnable, QThreadPool, QTimer, QAbstractListModel, QModelIndex, pyqtSignal
+)
+import database
+
+SEARCH_DELAY_MS = 250   # Wait this long after the last keystroke before querying
+SEARCH_LIMIT = 500      # Maximum rows fetched per search
+PAGE_SIZE = 50          # Rows added to the view each time it scrolls to the end
+CACHE_SIZE = 32         # Recent search terms kept in memory
+
+
+class PatientResultsModel(QAbstractListModel):
+    """Search results exposed to the view one page at a time"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._shown = 0
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self._rows = rows
+        self._shown = min(PAGE_SIZE, len(rows))
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._shown
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._shown < len(self._rows)
+
+    def fetchMore(self, parent=QModelIndex()):
+        count = min(PAGE_SIZE, len(self._rows) - self._shown)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._shown, self._shown + count - 1)
+        self._shown += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._shown:
+            return None
+        patient_id, name, bht_no = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{name} (BHT: {bht_no})"
+        if role == Qt.UserRole:
+            return patient_id
+        return None
+
+
+class _SearchSignals(QObject):
+    finished = pyqtSignal(int, str, list)  # generation, search term, rows
+    failed = pyqtSignal(int, str)
+
+
+class _SearchTask(QRunnable):
+    """Runs one find_patients() query on a pool thread"""
+
+    def __init__(self, generation, term, is_current):
+        super().__init__()
+        self.generation = generation
+        self.term = term
+        self.is_current = is_current
+        self.signals = _SearchSignals()
+
+    def run(self):
+        if not self.is_current(self.generation):
+            return  # User kept typing; skip the stale query
+        try:
+            rows = [
+                (row['id'], row['name'], row['bht_no'])
+                for row in database.find_patients(self.term, SEARCH_LIMIT)
+            ]
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+        else:
+            self.signals.finished.emit(self.generation, self.term, rows)
+        finally:
+            database.release_connection()
+
+
+class PatientSearchDialog(QDialog):
+    """Edit Record search: debounced, runs queries off the GUI thread"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Search Patient")
+        self.setMinimumWidth(400)
+        layout = QVBoxLayout(self)
+
+        self._generation = 0
+        self._cache = OrderedDict()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(SEARCH_DELAY_MS)
+        self._timer.timeout.connect(self.start_search)
+
+        # Search input
+        layout.addWidget(QLabel("Search by Name or BHT:"))
+        self.search_input = QLineEdit()
+        self.search_input.textChanged.connect(self.schedule_search)
+        layout.addWidget(self.search_input)
+
+        # Results list
+        self.results_model = PatientResultsModel(self)
+        self.search_results = QListView()
+        self.search_results.setModel(self.results_model)
+        self.search_results.setUniformItemSizes(True)
+        self.search_results.doubleClicked.connect(lambda index: self.accept())
+        layout.addWidget(self.search_results)
+
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        # Buttons
+        btn_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        btn_box.accepted.connect(self.accept)
+        btn_box.rejected.connect(self.reject)
+        layout.addWidget(btn_box)
+
+    def schedule_search(self):
+        # Invalidate whatever is queued or running, then restart the debounce
+        self._generation += 1
+        self._pool.clear()
+        self._timer.start()
+
+    def _is_current(self, generation):
+        return generation == self._generation
+
+    def start_search(self):
+        term = self.search_input.text().strip()
+        if not term:
+            self.results_model.set_rows([])
+            self.status_label.setText("")
+            return
+
+        if term in self._cache:
+            self._cache.move_to_end(term)
+            self.show_results(self._generation, term, self._cache[term])
+            return
+
+        self.status_label.setText("Searching...")
+        task = _SearchTask(self._generation, term, self._is_current)
+        task.signals.finished.connect(self.show_results)
+        task.signals.failed.connect(self.show_error)
+        self._pool.start(task)
+
+    def show_results(self, generation, term, rows):
+        self._cache[term] = rows
+        self._cache.move_to_end(term)
+        while len(self._cache) > CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+        if generation != self._generation:
+            return  # Results for text the user has already changed
+        self.results_model.set_rows(rows)
+        if len(rows) >= SEARCH_LIMIT:
+            self.status_label.setText(f"Showing first {SEARCH_LIMIT} matches")
+        else:
+            self.status_label.setText(f"{len(rows)} found")
+
+    def show_error(self, generation, message):
+        if generation == self._generation:
+            self.status_label.setText(f"Search failed: {message}")
+
+    def selected_patient_id(self):
+        index = self.search_results.currentIndex()
+        return index.data(Qt.UserRole) if index.isValid() else None
+
+    def accept(self):
+        if self.selected_patient_id() is None:
+            QMessageBox.warning(self, "Selection Error", "Please select a patient!")
+            return
+        super().accept()
+
+    def done(self, result):
+        self._generation += 1
+        self._timer.stop()
+        self._pool.clear()
+        self._pool.waitForDone()
+        super().done(result)
@@ -0,0 +1,81 @@
+# test_db_dropdown_io.py
+import os
+import tempfile
+import uuid
+import database
+import dropdown_io
+
+def temp_path(suffix):
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    return path
+
+def test_import_csv():
+    category = f"test_{uuid.uuid4().hex[:8]}"
+    path = temp_path(".csv")
+    try:
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write("value\nParacetamol\nCefuroxime\n\nParacetamol\n  \n")
+        counts = dropdown_io.import_options(path, category)
+        assert counts == {'read': 4, 'added': 2, 'duplicates': 1, 'invalid': 1}
+        assert database.get_dropdown_options(category) == ["Paracetamol", "Cefuroxime"]
+    finally:
+        os.remove(path)
+
+def test_import_plain_list_keeps_first_entry():
+    category = f"test_{uuid.uuid4().hex[:8]}"
+    path = temp_path(".csv")
+    try:
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write("Paracetamol\nCefuroxime\n")
+        assert dropdown_io.import_options(path, category)['added'] == 2
+        assert database.get_dropdown_options(category) == ["Paracetamol", "Cefuroxime"]
+    finally:
+        os.remove(path)
+
+def test_import_skips_values_that_are_not_text():
+    category = f"test_{uuid.uuid4().hex[:8]}"
+    path = temp_path(".json")
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('[{"value": 500}, {"value": null}, {"value": ["a"]}, "500 mg"]')
+        counts = dropdown_io.import_options(path, category)
+        assert counts == {'read': 4, 'added': 1, 'duplicates': 0, 'invalid': 3}
+        assert database.get_dropdown_options(category) == ["500 mg"]
+    finally:
+        os.remove(path)
+
+def test_import_many_in_chunks():
+    category = f"test_{uuid.uuid4().hex[:8]}"
+    options = ((category, f"Drug {i:05d}") for i in range(2500))
+    counts = database.import_dropdown_options(options, chunk_size=1000)
+    assert counts['added'] == 2500
+    assert database.count_dropdown_options(category) == 2500
+
+def test_json_round_trip():
+    category = f"test_{uuid.uuid4().hex[:8]}"
+    for value in ("Zeta", "Alpha", 'Quote "q", comma'):
+        database.add_dropdown_option(category, value)
+    expected = database.get_dropdown_options(category)
+
+    for suffix in (".json", ".jsonl", ".csv"):
+        path = temp_path(suffix)
+        try:
+            assert dropdown_io.export_options(path, [category]) == 3
+            assert list(dropdown_io.read_options(path)) == [(category, value) for value in expected]
+        finally:
+            os.remove(path)
+
+def test_json_array_streamed_in_small_chunks():
+    path = temp_path(".json")
+    chunk_size = dropdown_io.READ_CHUNK_SIZE
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('[ "Plain", {"value": "Object"}, {"category": "other", "value": "Elsewhere"} ]')
+        dropdown_io.READ_CHUNK_SIZE = 7  # Force entries to span reads
+        assert list(dropdown_io.read_options(path, "drug_name")) == [
+            ("drug_name", "Plain"), ("drug_name", "Object"), ("other", "Elsewhere")
+        ]
+    finally:
+        dropdown_io.READ_CHUNK_SIZE = chunk_size
+        os.remove(path)
@@ -0,0 +1,124 @@
+# test_db_dropdowns.py
+import sqlite3
+import uuid
+import database
+
+def unique_category():
+    return f"test_{uuid.uuid4().hex[:8]}"
+
+def test_cache_sees_own_writes():
+    category = unique_category()
+    version = database.dropdown_version()
+    assert database.add_dropdown_option(category, "Beta")
+    assert database.add_dropdown_option(category, "Alpha")
+    assert database.get_dropdown_options(category) == ["Beta", "Alpha"]  # In order added
+    assert database.changed_dropdown_categories(version) == {category}
+
+    version = database.dropdown_version()
+    assert database.delete_dropdown_option(category, "Beta")
+    assert database.get_dropdown_options(category) == ["Alpha"]
+    assert database.changed_dropdown_categories(version) == {category}
+
+def test_cache_sees_other_connections():
+    category = unique_category()
+    database.get_dropdown_options(category)
+
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.execute("INSERT INTO dropdown_options (category, value) VALUES (?, ?)", (category, "External"))
+    conn.commit()
+    conn.close()
+
+    recheck = database.DROPDOWN_RECHECK_SECONDS
+    database.DROPDOWN_RECHECK_SECONDS = 0
+    try:
+        assert database.get_dropdown_options(category) == ["External"]
+    finally:
+        database.DROPDOWN_RECHECK_SECONDS = recheck
+
+def test_configure_resets_cache(tmp_path):
+    category = unique_category()
+    database.add_dropdown_option(category, "Dr. Old")
+    assert database.get_dropdown_options(category) == ["Dr. Old"]
+    version = database.dropdown_version()
+
+    previous = database.DB_PATH
+    database.configure(db_path=str(tmp_path / "other.db"))
+    try:
+        assert database.get_dropdown_options(category) == []
+        assert category in database.changed_dropdown_categories(version)
+    finally:
+        database.configure(db_path=previous)
+    assert database.get_dropdown_options(category) == ["Dr. Old"]
+
+def test_revisions_bump_per_category():
+    category = unique_category()
+    before = database.get_dropdown_revisions().get(category, 0)
+    database.add_dropdown_option(category, "One")
+    database.add_dropdown_option(category, "Two")
+    database.delete_dropdown_option(category, "One")
+    assert database.get_dropdown_revisions()[category] == before + 3
+
+def display_orders(category):
+    with database.db_connection() as cursor:
+        cursor.execute(
+            "SELECT value, display_order FROM dropdown_options WHERE category = ?", (category,)
+        )
+        return dict(cursor.fetchall())
+
+def test_move_updates_one_row():
+    category = unique_category()
+    for value in ("A", "B", "C", "D"):
+        database.add_dropdown_option(category, value)
+    before = display_orders(category)
+
+    assert database.move_dropdown_option(category, "C", -1)
+    assert database.get_dropdown_options(category) == ["A", "C", "B", "D"]
+    after = display_orders(category)
+    assert [value for value in before if before[value] != after[value]] == ["C"]
+
+    assert database.move_dropdown_option(category, "A", 1)
+    assert database.get_dropdown_options(category) == ["C", "A", "B", "D"]
+    assert not database.move_dropdown_option(category, "C", -1)  # Already first
+    assert not database.move_dropdown_option(category, "D", 1)   # Already last
+    assert not database.move_dropdown_option(category, "missing", 1)
+
+def test_move_renumbers_when_gap_runs_out():
+    category = unique_category()
+    database.add_dropdown_option(category, "A")
+    database.add_dropdown_option(category, "B")
+    # Each new option is moved up to just after A, halving the gap below A
+    # every time until the category has to be renumbered
+    expected = ["A", "B"]
+    for i in range(12):
+        value = f"X{i}"
+        database.add_dropdown_option(category, value)
+        for _ in range(len(expected) - 1):
+            assert database.move_dropdown_option(category, value, -1)
+        expected.insert(1, value)
+    assert database.get_dropdown_options(category) == expected
+    assert len(set(display_orders(category).values())) == len(expected)
+
+def test_search_prefix_ignores_case():
+    category = unique_category()
+    for value in ["amoxicillin", "Amlodipine", "Aspirin", "atenolol", "Bisoprolol", "A@", "A["]:
+        database.add_dropdown_option(category, value)
+    assert database.search_dropdown_prefix(category, "am") == ["Amlodipine", "amoxicillin"]
+    assert database.search_dropdown_prefix(category, "AT") == ["atenolol"]
+    assert database.search_dropdown_prefix(category, "a@") == ["A@"]
+    assert database.search_dropdown_prefix(category, "a", limit=2) == ["A@", "A["]
+    assert database.search_dropdown_prefix(category, "c") == []
+    assert len(database.search_dropdown_prefix(category, "")) == 7
+
+def test_large_category_is_not_cached():
+    category = unique_category()
+    options = ((category, f"Drug {i:04d}") for i in range(database.LARGE_DROPDOWN_CATEGORY + 1))
+    database.import_dropdown_options(options)
+    assert database.is_large_dropdown_category(category)
+    assert database.get_dropdown_options(category) == []
+    assert category not in database._dropdown_cache._options
+    assert database.search_dropdown_prefix(category, "drug 000", limit=3) == ["Drug 0000", "Drug 0001", "Drug 0002"]
+
+    version = database.dropdown_version()
+    database.delete_dropdown_option(category, "Drug 0000")  # Now small enough to list
+    assert database.changed_dropdown_categories(version) == {category}
+    assert len(database.get_dropdown_options(category)) == database.LARGE_DROPDOWN_CATEGORY
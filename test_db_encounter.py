@@ -0,0 +1,136 @@
+# test_db_encounter.py
+import sqlite3
+import uuid
+import database
+
+def make_patient(name="Test Patient"):
+    return {
+        'name': name,
+        'age': 54,
+        'sex': "Male",
+        'admission_date': "2024-01-02",
+        'discharge_date': "2024-01-05",
+        'bht_no': f"T-{uuid.uuid4().hex[:10]}",
+        'indication': "Stone",
+        'history_exam': "",
+        'management': "",
+        'next_appointment': "2024-02-01T09:00:00"
+    }
+
+def make_operation(surgery="URS"):
+    return {
+        'surgeon': "Dr. Smith",
+        'anaesthetist': "Dr. Jones",
+        'anaesthesia_type': "General",
+        'surgery_name': surgery,
+        'surgery_description': ""
+    }
+
+def make_drug(name):
+    return {
+        'drug_name': name, 'drug_form': "Tab", 'strength': "500mg",
+        'dose': "1", 'frequency': "bd", 'route': "oral", 'duration': "5 days"
+    }
+
+def test_save_encounter():
+    patient_id = database.save_encounter(
+        make_patient(), make_operation(),
+        [make_drug("Paracetamol"), make_drug("Cefuroxime")],
+        [{'name': "Hb", 'value': "12.1"}],
+        [{'name': "Stent", 'value': "Left"}]
+    )
+    assert patient_id is not None
+    assert database.get_patient_operation(patient_id)['surgery_name'] == "URS"
+    assert len(database.get_patient_prescriptions(patient_id)) == 2
+    assert len(database.get_patient_investigations(patient_id)) == 1
+    assert database.get_op_variables(patient_id) == [{'name': "Stent", 'value': "Left"}]
+
+def test_save_encounter_duplicate_bht():
+    patient = make_patient()
+    assert database.save_encounter(patient, make_operation(), [], [], []) is not None
+    assert database.save_encounter(patient, make_operation(), [], [], []) is None
+
+def test_failed_encounter_is_rolled_back():
+    patient = make_patient()
+    try:
+        database.save_encounter(
+            patient, make_operation(), [make_drug("Paracetamol")], [],
+            [{'name': None, 'value': "Left"}]  # violates NOT NULL
+        )
+        assert False, "expected IntegrityError"
+    except sqlite3.IntegrityError:
+        pass
+    with database.db_connection() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM patients WHERE bht_no = ?", (patient['bht_no'],))
+        assert cursor.fetchone()[0] == 0
+
+def test_update_encounter():
+    patient = make_patient()
+    patient_id = database.save_encounter(
+        patient, make_operation(), [make_drug("Paracetamol")], [], []
+    )
+    patient['name'] = "Renamed Patient"
+    result = database.update_encounter(
+        patient_id, patient, make_operation("PCNL"),
+        [make_drug("Tramadol")], [{'name': "Creatinine", 'value': "90"}], []
+    )
+    assert result == patient_id
+    assert database.get_patient(patient_id)['name'] == "Renamed Patient"
+    assert database.get_patient_operation(patient_id)['surgery_name'] == "PCNL"
+    drugs = [row['drug_name'] for row in database.get_patient_prescriptions(patient_id)]
+    assert drugs == ["Tramadol"]
+
+def test_diff_save_keeps_unchanged_rows():
+    patient_id = database.save_encounter(
+        make_patient(), make_operation(),
+        [make_drug("Paracetamol"), make_drug("Cefuroxime")], [], []
+    )
+    with database.db_connection() as cursor:
+        cursor.execute("SELECT id FROM prescriptions WHERE patient_id = ? ORDER BY id", (patient_id,))
+        before = [row['id'] for row in cursor.fetchall()]
+
+    drugs = [make_drug("Paracetamol"), make_drug("Tramadol"), make_drug("Omeprazole")]
+    database.save_prescriptions(patient_id, drugs, diff=True)
+
+    rows = database.get_patient_prescriptions(patient_id)
+    assert [row['drug_name'] for row in rows] == ["Paracetamol", "Tramadol", "Omeprazole"]
+    assert rows[0]['id'] == before[0]  # unchanged leading row was not rewritten
+
+def test_bulk_op_variables():
+    patient_id = database.save_encounter(make_patient(), make_operation(), [], [], [])
+    variables = [{'name': f"Var {i}", 'value': str(i)} for i in range(50)]
+    database.save_op_variables(patient_id, variables)
+    assert database.get_op_variables(patient_id) == variables
+    database.save_op_variables(patient_id, variables[:10], diff=True)
+    assert database.get_op_variables(patient_id) == variables[:10]
+
+def test_load_patient_bundle():
+    patient_id = database.save_encounter(
+        make_patient("Bundle Patient"), make_operation(),
+        [make_drug("Paracetamol"), make_drug("Cefuroxime")],
+        [{'name': "Hb", 'value': "12.1"}],
+        [{'name': "Stent", 'value': "Left"}]
+    )
+    bundle = database.load_patient_bundle(patient_id)
+    assert bundle.patient['name'] == "Bundle Patient"
+    assert bundle.operation['surgery_name'] == "URS"
+    assert [row['drug_name'] for row in bundle.prescriptions] == ["Paracetamol", "Cefuroxime"]
+    assert isinstance(bundle.investigations, tuple)
+    assert [(row['name'], row['value']) for row in bundle.op_variables] == [("Stent", "Left")]
+    assert database.load_patient_bundle(-1) is None
+
+def test_delete_patient_cascades():
+    patient_id = database.save_encounter(
+        make_patient(), make_operation(), [make_drug("Paracetamol")],
+        [{'name': "Hb", 'value': "12.1"}], [{'name': "Stent", 'value': "Left"}]
+    )
+    with database.db_connection() as cursor:
+        cursor.execute(
+            "INSERT INTO report_history (patient_id, report_path, printed_at) VALUES (?, 'x.pdf', '2024-01-05 10:00:00')",
+            (patient_id,)
+        )
+    assert database.delete_patient(patient_id)
+    with database.db_connection() as cursor:
+        for table in ("operations", "prescriptions", "investigations", "op_variables", "report_history"):
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE patient_id = ?", (patient_id,))
+            assert cursor.fetchone()[0] == 0, table
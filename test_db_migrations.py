@@ -0,0 +1,111 @@
+# test_db_migrations.py
+import os
+import sqlite3
+import tempfile
+import database
+import migrations
+from repair_db import repair_database
+
+def open_temp_database():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn, path
+
+def test_migrate_new_database():
+    conn, path = open_temp_database()
+    try:
+        cursor = conn.cursor()
+        assert migrations.migrate(cursor) == [number for number, _, _ in migrations.MIGRATIONS]
+        conn.commit()
+        assert migrations.schema_version(cursor) == migrations.SCHEMA_VERSION
+        assert migrations.migrate(cursor) == []  # Already current
+        assert not conn.in_transaction
+    finally:
+        conn.close()
+        os.remove(path)
+
+def test_migrate_unversioned_database():
+    # A database created before versioning: tables only, user_version 0
+    conn, path = open_temp_database()
+    try:
+        cursor = conn.cursor()
+        migrations._base_schema(cursor)
+        cursor.executemany(
+            "INSERT INTO dropdown_options (category, value) VALUES (?, ?)",
+            [("surgeon", "Dr. Smith"), ("surgeon", "Dr. Adams"), ("sex", "Male")]
+        )
+        cursor.execute("INSERT INTO patients (name, bht_no) VALUES ('Kamal Perera', 'B-1')")
+        conn.commit()
+
+        migrations.migrate(cursor)
+        conn.commit()
+
+        cursor.execute(
+            "SELECT value, display_order FROM dropdown_options WHERE category = 'surgeon' ORDER BY display_order"
+        )
+        assert [tuple(row) for row in cursor.fetchall()] == [("Dr. Adams", 1024), ("Dr. Smith", 2048)]
+        cursor.execute("SELECT rowid FROM patient_search WHERE patient_search MATCH 'kamal'")
+        assert len(cursor.fetchall()) == 1
+        assert migrations.schema_version(cursor) == migrations.SCHEMA_VERSION
+    finally:
+        conn.close()
+        os.remove(path)
+
+def test_sparse_display_order_migration():
+    # A version 6 database, with options left unranked by other tools
+    conn, path = open_temp_database()
+    try:
+        cursor = conn.cursor()
+        for number, _, apply in migrations.MIGRATIONS[:6]:
+            apply(cursor)
+        cursor.execute("PRAGMA user_version = 6")
+        cursor.executemany(
+            "INSERT INTO dropdown_options (category, value, display_order) VALUES (?, ?, ?)",
+            [("route", "Oral", 1), ("route", "IV", 0), ("route", "SC", 1),
+             ("route", "PR", None), ("route", "IM", None), ("sex", "Male", 0)]
+        )
+        conn.commit()
+
+        assert migrations.migrate(cursor) == [n for n, _, _ in migrations.MIGRATIONS[6:]]
+        conn.commit()
+        cursor.execute("SELECT category, value, display_order FROM dropdown_options ORDER BY category, display_order")
+        assert [tuple(row) for row in cursor.fetchall()] == [
+            ("route", "IM", 1024), ("route", "PR", 2048), ("route", "IV", 3072),
+            ("route", "Oral", 4096), ("route", "SC", 5120), ("sex", "Male", 1024)
+        ]
+        cursor.execute("SELECT name FROM sqlite_temp_master WHERE name = 'dropdown_positions'")
+        assert cursor.fetchone() is None
+    finally:
+        conn.close()
+        os.remove(path)
+
+def test_migrate_refuses_old_sqlite(monkeypatch):
+    conn, path = open_temp_database()
+    monkeypatch.setattr(sqlite3, "sqlite_version_info", (3, 22, 0))
+    try:
+        try:
+            migrations.migrate(conn.cursor())
+        except RuntimeError as e:
+            assert "too old" in str(e)
+        else:
+            raise AssertionError("migrate() ran on an unsupported SQLite")
+        assert migrations.schema_version(conn.cursor()) == 0
+    finally:
+        conn.close()
+        os.remove(path)
+
+def test_repair_reports_migrations_applied_on_open(tmp_path, capsys):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    migrations._base_schema(conn.cursor())
+    conn.commit()
+    conn.close()
+
+    database.configure(db_path=path)  # Upgrades the schema when opened
+    repair_database()
+    output = capsys.readouterr().out
+    assert f"upgraded from version 0 to {migrations.SCHEMA_VERSION}" in output
+    for number, description, _ in migrations.MIGRATIONS:
+        assert f"{number}: {description}" in output
@@ -0,0 +1,34 @@
+# test_db_profiles.py
+import os
+import subprocess
+import sys
+import pytest
+import database
+
+def journal_mode():
+    with database.db_connection() as cursor:
+        cursor.execute("PRAGMA journal_mode")
+        return cursor.fetchone()[0].lower()
+
+def test_auto_profile_uses_wal_on_local_disk(tmp_path):
+    assert not database.is_network_path(str(tmp_path / "local.db"))
+    assert database.resolve_profile("auto", str(tmp_path / "local.db")) == database.PROFILES["workstation"]
+
+def test_shared_profile_keeps_rollback_journal(tmp_path):
+    database.configure(db_path=str(tmp_path / "shared.db"), profile="shared")
+    try:
+        assert journal_mode() == "delete"
+    finally:
+        database.configure(profile="auto")
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError, match="Unknown database profile"):
+        database.resolve_profile("fast", "urology_data.db")
+
+    env = dict(os.environ, SURGERY_DB_PROFILE="fast")
+    result = subprocess.run(
+        [sys.executable, "-c", "import database"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True
+    )
+    assert result.returncode != 0
+    assert "SURGERY_DB_PROFILE: Unknown database profile 'fast'" in result.stderr
@@ -0,0 +1,36 @@
+# test_db_reports.py
+import database
+from test_db_encounter import make_patient, make_operation
+
+def add_report(patient_id, path, content_hash):
+    with database.db_connection() as cursor:
+        cursor.execute(
+            """INSERT INTO report_history (patient_id, report_path, printed_at, content_hash)
+               VALUES (?, ?, '2024-01-05 10:00:00', ?)""",
+            (patient_id, path, content_hash)
+        )
+
+def test_find_cached_report():
+    patient_id = database.save_encounter(make_patient(), make_operation(), [], [], [])
+    assert database.find_cached_report(patient_id, "abc") is None
+    add_report(patient_id, "reports/old.pdf", "abc")
+    add_report(patient_id, "reports/new.pdf", "abc")
+    add_report(patient_id, "reports/other.pdf", "def")
+    assert database.find_cached_report(patient_id, "abc") == "reports/new.pdf"
+    assert database.find_cached_report(patient_id, "def") == "reports/other.pdf"
+    assert database.find_cached_report(patient_id, None) is None
+
+def test_print_history_pages():
+    patient_id = database.save_encounter(make_patient(), make_operation(), [], [], [])
+    for i in range(7):
+        add_report(patient_id, f"reports/{i}.pdf", None)  # same printed_at: ordered by id
+    pages = []
+    after = None
+    while True:
+        rows = database.get_print_history_page(patient_id, limit=3, after=after)
+        if not rows:
+            break
+        pages.append([row['report_path'] for row in rows])
+        after = (rows[-1]['printed_at'], rows[-1]['id'])
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == [f"reports/{i}.pdf" for i in reversed(range(7))]
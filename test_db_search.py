@@ -0,0 +1,36 @@
+# test_db_search.py
+import uuid
+import database
+from test_db_encounter import make_patient, make_operation
+
+def test_find_patients_by_prefix():
+    tag = uuid.uuid4().hex[:8]
+    patient = make_patient(f"Kamal Perera{tag}")
+    patient_id = database.save_encounter(patient, make_operation("Nephrectomy"), [], [], [])
+
+    assert patient_id in [row['id'] for row in database.find_patients(f"kam perera{tag[:4]}")]
+    assert patient_id in [row['id'] for row in database.find_patients(patient['bht_no'])]
+    assert database.find_patients("") == []
+
+def test_search_index_follows_updates():
+    if not database.FTS_AVAILABLE:
+        return
+    tag = uuid.uuid4().hex[:8]
+    patient = make_patient(f"Nimal{tag}")
+    patient_id = database.save_encounter(patient, make_operation(f"Cystoscopy{tag}"), [], [], [])
+    assert [row['id'] for row in database.find_patients(f"cystoscopy{tag}")] == [patient_id]
+
+    patient['name'] = f"Sunil{tag}"
+    database.update_encounter(patient_id, patient, make_operation(f"Ureteroscopy{tag}"), [], [], [])
+    assert database.find_patients(f"nimal{tag}") == []
+    assert database.find_patients(f"cystoscopy{tag}") == []
+    assert [row['id'] for row in database.find_patients(f"sunil{tag}")] == [patient_id]
+
+    database.delete_patient(patient_id)
+    assert database.find_patients(f"sunil{tag}") == []
+
+def test_find_patients_limit():
+    tag = uuid.uuid4().hex[:8]
+    for i in range(5):
+        database.save_encounter(make_patient(f"Limit{tag} {i}"), make_operation(), [], [], [])
+    assert len(database.find_patients(f"limit{tag}", limit=3)) == 3
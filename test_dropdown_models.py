@@ -0,0 +1,65 @@
+# test_dropdown_models.py
+import os
+import uuid
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtWidgets import QApplication, QComboBox
+import database
+import dropdown_models
+
+app = QApplication.instance() or QApplication([])
+
+def bound_combos(category, values, selected):
+    for value in values:
+        database.add_dropdown_option(category, value)
+    combos = [QComboBox(), QComboBox()]
+    for combo in combos:
+        dropdown_models.bind_combo(combo, category)
+    combos[0].setCurrentText(selected)
+    return combos
+
+def test_moved_option_stays_selected():
+    category = f"test_{uuid.uuid4().hex[:8]}"
+    selected, other = bound_combos(category, ["Dr. A", "Dr. B", "Dr. C"], "Dr. B")
+    assert database.move_dropdown_option(category, "Dr. B", -1)
+    assert database.move_dropdown_option(category, "Dr. C", -1)
+    assert database.move_dropdown_option(category, "Dr. C", -1)
+    database.add_dropdown_option(category, "Dr. D")
+    dropdown_models.refresh_dropdown_models({category})
+
+    assert [selected.itemText(i) for i in range(selected.count())] == ["", "Dr. C", "Dr. B", "Dr. A", "Dr. D"]
+    assert selected.currentText() == "Dr. B"
+    assert other.currentText() == ""
+
+def test_deleted_option_resets_selection():
+    category = f"test_{uuid.uuid4().hex[:8]}"
+    selected, other = bound_combos(category, ["Dr. A", "Dr. B", "Dr. C"], "Dr. B")
+    other.setCurrentText("Dr. C")
+    assert database.delete_dropdown_option(category, "Dr. B")
+    dropdown_models.refresh_dropdown_models({category})
+
+    assert selected.currentIndex() == 0
+    assert selected.currentText() == ""
+    assert other.currentText() == "Dr. C"
+
+def test_combos_switch_mode_when_category_crosses_threshold(monkeypatch):
+    monkeypatch.setattr(database, "LARGE_DROPDOWN_CATEGORY", 15)
+    category = f"test_{uuid.uuid4().hex[:8]}"
+    selected, other = bound_combos(category, [f"Drug {i}" for i in range(10)], "Drug 3")
+
+    database.import_dropdown_options((category, f"Drug {i}") for i in range(10, 20))
+    dropdown_models.refresh_dropdown_models({category})
+    assert selected.isEditable() and other.isEditable()
+    assert selected.currentText() == "Drug 3"
+    assert other.currentText() == ""
+    new_row = QComboBox()
+    dropdown_models.bind_combo(new_row, category)
+    assert new_row.isEditable()
+
+    for i in range(12, 20):
+        database.delete_dropdown_option(category, f"Drug {i}")
+    dropdown_models.refresh_dropdown_models({category})
+    for combo in (selected, other, new_row):
+        assert not combo.isEditable()
+        assert combo.count() == 13
+    assert selected.currentText() == "Drug 3"
+    assert other.currentIndex() == 0
@@ -0,0 +1,148 @@
+# test_pdf_generator.py
+import os
+import threading
+import pytest
+import database
+import pdf_generator
+from test_db_encounter import make_patient, make_operation
+
+class StubBackend:
+    """Writes the HTML as the "PDF"; fails for reports mentioning FAIL"""
+    name = "stub"
+
+    def __init__(self):
+        self.converted = []
+        self._lock = threading.Lock()
+
+    def convert(self, html, output_path):
+        if "FAIL" in html:
+            raise RuntimeError("conversion failed")
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        with self._lock:
+            self.converted.append(output_path)
+
+@pytest.fixture
+def stub_backend(tmp_path, monkeypatch):
+    template_dir = tmp_path / "templates"
+    template_dir.mkdir()
+    (template_dir / "report.html").write_text("{{ patient.name }} {{ operation.surgery_name }}")
+    monkeypatch.setattr(pdf_generator, "TEMPLATE_DIR", str(template_dir))
+    monkeypatch.setattr(pdf_generator, "_template_env", None)
+    backend = StubBackend()
+    monkeypatch.setitem(pdf_generator._backends, "stub", backend)
+    monkeypatch.setattr(pdf_generator, "PDF_BACKEND", "stub")
+    return backend
+
+def write_file(path, size, mtime):
+    with open(path, "wb") as f:
+        f.write(b"%" * size)
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+def test_content_hash_follows_report_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_generator, "TEMPLATE_DIR", str(tmp_path))
+    template = tmp_path / "report.html"
+    template.write_text("{{ patient.name }}")
+
+    patient_id = database.save_encounter(make_patient(), make_operation(), [], [], [])
+    bundle = database.load_patient_bundle(patient_id)
+    content_hash = pdf_generator.report_content_hash(bundle, "General Hospital", "Urology")
+    assert pdf_generator.report_content_hash(bundle, "General Hospital", "Urology") == content_hash
+    assert pdf_generator.report_content_hash(bundle, "General Hospital", "Surgery") != content_hash
+
+    database.update_operation(bundle.operation['id'], make_operation("PCNL"))
+    changed = database.load_patient_bundle(patient_id)
+    assert pdf_generator.report_content_hash(changed, "General Hospital", "Urology") != content_hash
+
+    template.write_text("{{ patient.name }} {{ patient.age }}")
+    assert pdf_generator.report_content_hash(bundle, "General Hospital", "Urology") != content_hash
+
+def test_evict_removes_oldest_reports_and_history(tmp_path, monkeypatch):
+    reports_dir = tmp_path / "reports"
+    reports_dir.mkdir()
+    monkeypatch.setattr(pdf_generator, "REPORTS_DIR", str(reports_dir))
+    patient_id = database.save_encounter(make_patient(), make_operation(), [], [], [])
+    paths = [write_file(reports_dir / f"patient_{patient_id}_{i}.pdf", 100, 1000 + i) for i in range(4)]
+    write_file(reports_dir / "notes.txt", 1000, 0)  # Not a report; never removed or counted
+    write_file(reports_dir / "letter.pdf", 1000, 0)  # Not written by us either
+    pdf_generator.record_report_history([(patient_id, path, None) for path in paths])
+
+    # Oldest first, but the first report is in use and must stay
+    removed = pdf_generator.evict_reports(max_bytes=250, keep=[paths[0]])
+    assert removed == paths[1:3]
+    assert sorted(os.listdir(reports_dir)) == sorted(["notes.txt", "letter.pdf", os.path.basename(paths[0]),
+                                                      os.path.basename(paths[3])])
+    history = [row['report_path'] for row in database.get_print_history(patient_id)]
+    assert sorted(history) == [paths[0], paths[3]]
+
+    assert pdf_generator.evict_reports(max_bytes=250) == []
+    monkeypatch.setattr(pdf_generator, "REPORTS_DIR", str(tmp_path / "missing"))
+    assert pdf_generator.evict_reports(max_bytes=1) == []
+
+def test_generate_reports_batch(tmp_path, stub_backend, monkeypatch):
+    ok = [database.save_encounter(make_patient(f"Patient {i}"), make_operation(), [], [], []) for i in range(3)]
+    failing = database.save_encounter(make_patient("FAIL"), make_operation(), [], [], [])
+    missing = max(ok + [failing]) + 100
+
+    history_writes = []
+    record = pdf_generator.record_report_history
+
+    def record_and_count(entries):
+        history_writes.append(list(entries))
+        record(history_writes[-1])
+    monkeypatch.setattr(pdf_generator, "record_report_history", record_and_count)
+    progress = []
+    reports, errors = pdf_generator.generate_reports(
+        ok + [failing, missing, ok[0]], str(tmp_path / "reports"), "General Hospital", "Urology",
+        progress=lambda done, total, patient_id: progress.append((done, total, patient_id)),
+        max_workers=2
+    )
+
+    assert sorted(reports) == sorted(ok)
+    assert all(open(reports[patient_id]).read().startswith(f"Patient {i} ") for i, patient_id in enumerate(ok))
+    assert set(errors) == {failing, missing}
+    assert isinstance(errors[missing], ValueError)
+    assert isinstance(errors[failing], RuntimeError)
+    assert [done for done, _, _ in progress] == [1, 2, 3, 4, 5]  # ok[0] is only generated once
+    assert {total for _, total, _ in progress} == {5}
+    assert sorted(patient_id for _, _, patient_id in progress) == sorted(ok + [failing, missing])
+    # One history write for the whole batch, with a row per new report
+    assert len(history_writes) == 1
+    assert sorted(patient_id for patient_id, _, _ in history_writes[0]) == sorted(ok)
+
+def test_generate_reports_reuses_cache_across_batches(tmp_path, stub_backend):
+    patients = [database.save_encounter(make_patient(f"Patient {i}"), make_operation(), [], [], []) for i in range(2)]
+    output_dir = str(tmp_path / "reports")
+    first, _ = pdf_generator.generate_reports(patients, output_dir)
+    assert len(stub_backend.converted) == 2
+
+    second, errors = pdf_generator.generate_reports(patients, output_dir)
+    assert not errors
+    assert second == first
+    assert len(stub_backend.converted) == 2  # Nothing converted again
+    assert all(len(database.get_print_history(patient_id)) == 1 for patient_id in patients)
+
+    operation = database.load_patient_bundle(patients[0]).operation
+    database.update_operation(operation['id'], make_operation("PCNL"))
+    third, _ = pdf_generator.generate_reports(patients, output_dir)
+    assert len(stub_backend.converted) == 3  # Only the changed patient
+    assert third[patients[1]] == first[patients[1]]
+    assert "PCNL" in open(third[patients[0]]).read()
+
+def test_only_the_reports_folder_is_evicted(tmp_path, stub_backend, monkeypatch):
+    monkeypatch.setattr(pdf_generator, "REPORTS_DIR", str(tmp_path / "reports"))
+    evictions = []
+    monkeypatch.setattr(pdf_generator, "evict_reports", lambda **kwargs: evictions.append(kwargs))
+    patient_id = database.save_encounter(make_patient(), make_operation(), [], [], [])
+
+    documents = tmp_path / "Documents"
+    documents.mkdir()
+    pdf_generator.generate_patient_report(patient_id, output_path=str(documents / "report.pdf"))
+    pdf_generator.generate_reports([patient_id], str(documents / "batch"))
+    assert evictions == []
+
+    pdf_generator.generate_patient_report(patient_id, hospital_name="General Hospital")
+    assert len(evictions) == 1
+    pdf_generator.generate_reports([patient_id], pdf_generator.REPORTS_DIR, unit_name="Urology")
+    assert len(evictions) == 2